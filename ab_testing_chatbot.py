@@ -1,10 +1,14 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
 import os
+import re
+import asyncio
+import threading
+import importlib.util
+from functools import cached_property, lru_cache
 from dotenv import load_dotenv
-from openai import OpenAI
-from scipy import stats
+from openai import AsyncOpenAI
 from superlinked.framework.dsl.space.categorical_similarity_space import CategoricalSimilaritySpace
 from superlinked.framework.dsl.space.number_space import NumberSpace
 from superlinked.framework.dsl.space.text_similarity_space import TextSimilaritySpace
@@ -15,9 +19,97 @@ from superlinked.framework.dsl.executor.in_memory.in_memory_executor import InMe
 from superlinked.framework.common.schema.id_schema_object import IdSchemaObject
 from superlinked.framework.common.schema.schema import schema
 from superlinked.framework.common.schema.schema_object import String, Integer, Float
+from analytics import welch_t_test
+from vector_search import install_batched_search
+from event_loop import run_coroutine
+
+try:
+    import ahocorasick  # pyahocorasick (opcional)
+except ImportError:
+    ahocorasick = None
+
+try:
+    from prompt_toolkit import PromptSession  # prompt_toolkit (opcional)
+except ImportError:
+    PromptSession = None
 
 load_dotenv()
 
+# Palabra clave -> (campo, valor, prioridad). Dentro de un mismo campo gana la
+# prioridad más baja, igual que el orden de los if/elif originales. Los plurales se
+# listan aparte porque las palabras clave se comparan como palabra completa.
+FILTER_KEYWORDS = {
+    'control': ('experimento', 'Control', 0),
+    'experimento': ('experimento', 'Experimento_A', 1),
+    'experimentos': ('experimento', 'Experimento_A', 1),
+    'variante': ('experimento', 'Experimento_A', 1),
+    'variantes': ('experimento', 'Experimento_A', 1),
+    'este': ('region', 'Este', 0),
+    'norte': ('region', 'Norte', 1),
+    'sur': ('region', 'Sur', 2),
+    'oeste': ('region', 'Oeste', 3),
+    'mall': ('tipo_tienda', 'Mall', 0),
+    'malls': ('tipo_tienda', 'Mall', 0),
+    'street': ('tipo_tienda', 'Street', 1),
+    'calle': ('tipo_tienda', 'Street', 1),
+    'calles': ('tipo_tienda', 'Street', 1),
+    'outlet': ('tipo_tienda', 'Outlet', 2),
+    'outlets': ('tipo_tienda', 'Outlet', 2),
+}
+
+FILTER_FIELDS = ('experimento', 'region', 'tipo_tienda')
+
+# Letras que forman palabra en una consulta (minúsculas, con acentos). Las palabras clave solo
+# cuentan como palabra completa: "oeste", "sureste" o "noreste" no activan el filtro de "este"
+WORD_CHARS = "a-záéíóúüñ"
+WORD_CHAR_PATTERN = re.compile(rf"[{WORD_CHARS}]")
+FILTER_KEYWORD_PATTERN = re.compile(
+    rf"(?<![{WORD_CHARS}])(?:"
+    + "|".join(sorted(map(re.escape, FILTER_KEYWORDS), key=len, reverse=True))
+    + rf")(?![{WORD_CHARS}])"
+)
+
+# Esquema conocido del CSV: evita la inferencia de tipos y usa categóricas
+# para las columnas de texto de baja cardinalidad. Las métricas decimales se
+# mantienen en float64 para no perder precisión en totales y respuestas
+CSV_DTYPES = {
+    'experimento': 'category',
+    'tienda_id': 'string',
+    'region': 'category',
+    'tipo_tienda': 'category',
+    'usuarios': 'int32',
+    'conversiones': 'int32',
+    'revenue': 'float64',
+    'conversion_rate': 'float64'
+}
+
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+# Tamaño de lote al indexar documentos en Superlinked
+INDEX_BATCH_SIZE = 10_000
+
+# Longitud máxima de cada descripción incluida en el prompt
+SNIPPET_MAX_CHARS = 200
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Consulta usada para precalentar el modelo de embeddings al arrancar
+WARMUP_QUERY = "rendimiento del experimento por región"
+
+# Número de búsquedas semánticas recordadas (evita re-embeber consultas repetidas)
+SEARCH_CACHE_SIZE = 2048
+
+def _build_filter_automaton():
+    """Compila todas las palabras clave en un autómata Aho-Corasick (si está disponible)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword, target in FILTER_KEYWORDS.items():
+        automaton.add_word(keyword, (len(keyword), target))
+    automaton.make_automaton()
+    return automaton
+
+FILTER_AUTOMATON = _build_filter_automaton()
+
 @schema
 class ABTestingSchema:
     id: IdSchemaObject
@@ -35,13 +127,34 @@ class ABTestingChatbot:
     def __init__(self, csv_file_path: str):
         self.csv_file_path = csv_file_path
         self.data = self.load_data()
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         self.schema = ABTestingSchema()
+        # Pares (nombre, campo del schema) usados al formatear resultados
+        self._data_fields = tuple(
+            (name, getattr(self.schema, name))
+            for name in ('experimento', 'tienda_id', 'region', 'tipo_tienda',
+                         'usuarios', 'conversiones', 'revenue', 'conversion_rate')
+        )
         self.vector_index = self.create_superlinked_index()
+        # Cache por instancia de búsquedas semánticas: (consulta, filtros, top_k) -> resultados
+        self._cached_similar_data = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search_similar_data)
+        # cached_property no es seguro entre hilos: el precalentamiento y la primera consulta
+        # calculan el análisis/contexto fijo bajo este lock para hacerlo una sola vez
+        self._analysis_lock = threading.Lock()
+        # Precalentar análisis y embeddings mientras el usuario escribe su primera pregunta
+        threading.Thread(target=self._prewarm, daemon=True).start()
         
     def load_data(self) -> pd.DataFrame:
         """Carga y prepara los datos del CSV"""
-        df = pd.read_csv(self.csv_file_path)
+        df = pd.read_csv(
+            self.csv_file_path,
+            usecols=list(CSV_DTYPES),
+            dtype=CSV_DTYPES,
+            engine=CSV_ENGINE
+        )
+        # Invalidar el análisis cacheado si los datos se recargan
+        self.__dict__.pop('ab_analysis', None)
+        self.__dict__.pop('context_prefix', None)
         return df
     
     def create_superlinked_index(self):
@@ -113,35 +226,27 @@ class ABTestingChatbot:
         ])
         
         # Configurar base de datos vectorial y executor
+        install_batched_search()  # similitudes por lotes (matmul) en el VDB en memoria
         vector_db = InMemoryVectorDatabase()
         executor = InMemoryExecutor(vector_db)
         
-        # Preparar y cargar datos
-        documents = []
-        for idx, row in self.data.iterrows():
-            description = f"""
-            Experimento {row['experimento']} en tienda {row['tienda_id']} 
-            ubicada en región {row['region']} de tipo {row['tipo_tienda']}.
-            Métricas: {row['usuarios']} usuarios, {row['conversiones']} conversiones,
-            ${row['revenue']:.2f} revenue, {row['conversion_rate']}% conversion rate.
-            """
-            
-            doc = {
-                self.schema.id: str(idx),
-                self.schema.experimento: row['experimento'],
-                self.schema.tienda_id: row['tienda_id'],
-                self.schema.region: row['region'],
-                self.schema.tipo_tienda: row['tipo_tienda'],
-                self.schema.usuarios: int(row['usuarios']),
-                self.schema.conversiones: int(row['conversiones']),
-                self.schema.revenue: float(row['revenue']),
-                self.schema.conversion_rate: float(row['conversion_rate']),
-                self.schema.description: description.strip()
-            }
-            documents.append(doc)
+        # Preparar y cargar datos (construcción columnar, sin iterrows)
+        df = self.data
+        descriptions = (
+            "Experimento " + df['experimento'].astype(str) + " en tienda " + df['tienda_id'].astype(str) +
+            "\nubicada en región " + df['region'].astype(str) + " de tipo " + df['tipo_tienda'].astype(str) + "." +
+            "\nMétricas: " + df['usuarios'].astype(str) + " usuarios, " +
+            df['conversiones'].astype(str) + " conversiones," +
+            "\n$" + df['revenue'].map('{:.2f}'.format) + " revenue, " +
+            df['conversion_rate'].astype(str) + "% conversion rate."
+        )
         
-        # Indexar documentos
-        executor.put(documents, index)
+        frame = df.assign(id=df.index.astype(str), description=descriptions)
+        fields = {name: getattr(self.schema, name) for name in frame.columns}
+        
+        # Indexar documentos por lotes: solo un lote de dicts vive en memoria a la vez
+        for documents in self._iter_document_batches(frame, fields):
+            executor.put(documents, index)
         
         return {
             'index': index,
@@ -149,34 +254,62 @@ class ABTestingChatbot:
             'schema': self.schema
         }
     
+    @staticmethod
+    def _iter_document_batches(frame: pd.DataFrame, fields: Dict, batch_size: int = INDEX_BATCH_SIZE):
+        """Genera lotes de documentos (claves = campos del schema) a partir de un DataFrame"""
+        for start in range(0, len(frame), batch_size):
+            records = frame.iloc[start:start + batch_size].to_dict(orient='records')
+            yield [
+                {fields[name]: value for name, value in record.items()}
+                for record in records
+            ]
+    
+    @cached_property
+    def ab_analysis(self) -> Dict[str, Any]:
+        """Análisis de AB Testing calculado una sola vez (los datos no cambian tras la carga)"""
+        return self.analyze_ab_test_results()
+    
+    @cached_property
+    def context_prefix(self) -> str:
+        """Parte fija del contexto (análisis general), formateada una sola vez"""
+        ab_analysis = self.ab_analysis
+        return f"""
+        Eres un analista experto en AB Testing. Tienes acceso a los siguientes datos:
+        
+        ANÁLISIS GENERAL DEL EXPERIMENTO:
+        - Control: {ab_analysis['control']['total_usuarios']} usuarios, {ab_analysis['control']['total_conversiones']} conversiones, ${ab_analysis['control']['total_revenue']:.2f} revenue
+        - Experimento A: {ab_analysis['experiment']['total_usuarios']} usuarios, {ab_analysis['experiment']['total_conversiones']} conversiones, ${ab_analysis['experiment']['total_revenue']:.2f} revenue
+        - Lift en conversión: {ab_analysis['conversion_lift']:.2f}%
+        - Lift en revenue: {ab_analysis['revenue_lift']:.2f}%
+        - Significancia estadística: {'Sí' if ab_analysis['statistical_significance']['is_significant'] else 'No'} (p-value: {ab_analysis['statistical_significance']['p_value']:.4f})
+        
+        DATOS MÁS RELEVANTES PARA LA CONSULTA (usando búsqueda vectorial):
+        """
+    
     def analyze_ab_test_results(self) -> Dict[str, Any]:
         """Analiza los resultados del AB Testing"""
-        control_data = self.data[self.data['experimento'] == 'Control']
-        experiment_data = self.data[self.data['experimento'] == 'Experimento_A']
+        # Un único groupby en lugar de una máscara booleana por grupo
+        grouped = self.data.groupby('experimento', sort=False, observed=True)
         
         # Métricas agregadas
-        control_metrics = {
-            'total_usuarios': control_data['usuarios'].sum(),
-            'total_conversiones': control_data['conversiones'].sum(),
-            'total_revenue': control_data['revenue'].sum(),
-            'avg_conversion_rate': control_data['conversion_rate'].mean()
-        }
+        aggregated = grouped.agg(
+            total_usuarios=('usuarios', 'sum'),
+            total_conversiones=('conversiones', 'sum'),
+            total_revenue=('revenue', 'sum'),
+            avg_conversion_rate=('conversion_rate', 'mean')
+        ).to_dict(orient='index')
         
-        experiment_metrics = {
-            'total_usuarios': experiment_data['usuarios'].sum(),
-            'total_conversiones': experiment_data['conversiones'].sum(),
-            'total_revenue': experiment_data['revenue'].sum(),
-            'avg_conversion_rate': experiment_data['conversion_rate'].mean()
-        }
+        control_metrics = aggregated['Control']
+        experiment_metrics = aggregated['Experimento_A']
         
         # Calcular lifts
         conversion_lift = ((experiment_metrics['avg_conversion_rate'] - control_metrics['avg_conversion_rate']) / control_metrics['avg_conversion_rate']) * 100
         revenue_lift = ((experiment_metrics['total_revenue'] - control_metrics['total_revenue']) / control_metrics['total_revenue']) * 100
         
         # Test de significancia estadística
-        control_rates = control_data['conversion_rate'].values
-        experiment_rates = experiment_data['conversion_rate'].values
-        t_stat, p_value = stats.ttest_ind(control_rates, experiment_rates)
+        control_rates = grouped.get_group('Control')['conversion_rate'].values
+        experiment_rates = grouped.get_group('Experimento_A')['conversion_rate'].values
+        t_stat, p_value = welch_t_test(control_rates, experiment_rates)
         
         return {
             'control': control_metrics,
@@ -190,14 +323,35 @@ class ABTestingChatbot:
             }
         }
     
+    def _get_context_prefix(self) -> str:
+        """Contexto fijo, calculado una sola vez aunque lo pidan varios hilos a la vez"""
+        with self._analysis_lock:
+            return self.context_prefix
+    
     def find_similar_data(self, query: str, filters: Dict = None, top_k: int = 5) -> List[Dict]:
         """Busca datos similares usando Superlinked multi-attribute indexing"""
+        # Las consultas repetidas no vuelven a pagar el embedding ni la búsqueda
+        filter_items = frozenset(filters.items()) if filters else frozenset()
+        return self._cached_similar_data(query, filter_items, top_k)
+    
+    def _prewarm(self):
+        """Calcula el análisis/contexto fijo y ejecuta una búsqueda de calentamiento"""
+        # Corre en segundo plano mientras se escribe en consola: no imprime nada. Si falla,
+        # la primera consulta repite el trabajo en primer plano y muestra el error
+        try:
+            self._get_context_prefix()
+            self._search_similar_data(WARMUP_QUERY, frozenset(), 1)
+        except Exception:
+            pass
+    
+    def _search_similar_data(self, query: str, filter_items: frozenset, top_k: int) -> List[Dict]:
+        """Ejecuta la búsqueda semántica en Superlinked (sin cache)"""
         # Crear query usando Superlinked
         query_obj = Query(self.vector_index['index'])
         
         # Añadir filtros si se proporcionan
-        if filters:
-            for field, value in filters.items():
+        if filter_items:
+            for field, value in filter_items:
                 if hasattr(self.schema, field):
                     query_obj = query_obj.filter(getattr(self.schema, field) == value)
         
@@ -207,22 +361,16 @@ class ABTestingChatbot:
         # Ejecutar query
         results = self.vector_index['executor'].query(query_obj)
         
-        # Formatear resultados
+        # Formatear resultados (campos del schema resueltos una sola vez)
+        data_fields = self._data_fields
+        description_field = self.schema.description
         formatted_results = []
         for result in results:
+            document = result.document
             formatted_results.append({
                 'similarity': result.score,
-                'data': {
-                    'experimento': result.document[self.schema.experimento],
-                    'tienda_id': result.document[self.schema.tienda_id],
-                    'region': result.document[self.schema.region],
-                    'tipo_tienda': result.document[self.schema.tipo_tienda],
-                    'usuarios': result.document[self.schema.usuarios],
-                    'conversiones': result.document[self.schema.conversiones],
-                    'revenue': result.document[self.schema.revenue],
-                    'conversion_rate': result.document[self.schema.conversion_rate]
-                },
-                'description': result.document[self.schema.description]
+                'data': {name: document[field] for name, field in data_fields},
+                'description': document[description_field]
             })
         
         return formatted_results
@@ -239,62 +387,52 @@ class ABTestingChatbot:
         # Ejecutar query
         results = self.vector_index['executor'].query(query_obj.limit(20))
         
-        # Formatear resultados
+        # Formatear resultados (campos del schema resueltos una sola vez)
+        data_fields = self._data_fields
+        description_field = self.schema.description
         formatted_results = []
         for result in results:
+            document = result.document
             formatted_results.append({
-                'data': {
-                    'experimento': result.document[self.schema.experimento],
-                    'tienda_id': result.document[self.schema.tienda_id],
-                    'region': result.document[self.schema.region],
-                    'tipo_tienda': result.document[self.schema.tipo_tienda],
-                    'usuarios': result.document[self.schema.usuarios],
-                    'conversiones': result.document[self.schema.conversiones],
-                    'revenue': result.document[self.schema.revenue],
-                    'conversion_rate': result.document[self.schema.conversion_rate]
-                },
-                'description': result.document[self.schema.description]
+                'data': {name: document[field] for name, field in data_fields},
+                'description': document[description_field]
             })
         
         return formatted_results
     
-    def generate_response(self, user_query: str) -> str:
+    def generate_response(self, user_query: str,
+                          on_token: Optional[Callable[[str], None]] = None) -> str:
         """Genera respuesta usando OpenAI con contexto de los datos de Superlinked"""
+        # Event loop compartido en su propio hilo: el cliente async reutiliza conexiones entre turnos
+        return run_coroutine(self.agenerate_response(user_query, on_token))
+    
+    async def agenerate_response(self, user_query: str,
+                                 on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Versión async: búsquedas y análisis se solapan antes de llamar a OpenAI.
+        
+        La respuesta se recibe en streaming; `on_token` recibe cada fragmento a medida que llega.
+        """
         # Detectar posibles filtros en la consulta
         filters = self.extract_filters_from_query(user_query)
         
-        # Buscar datos relevantes usando Superlinked
-        relevant_data = self.find_similar_data(user_query, filters)
-        
-        # También buscar por atributos específicos si hay filtros
-        attribute_data = []
-        if filters:
-            attribute_data = self.query_by_attributes(**filters)
-        
-        # Obtener análisis general
-        ab_analysis = self.analyze_ab_test_results()
-        
-        # Crear contexto para OpenAI
-        context = f"""
-        Eres un analista experto en AB Testing. Tienes acceso a los siguientes datos:
-        
-        ANÁLISIS GENERAL DEL EXPERIMENTO:
-        - Control: {ab_analysis['control']['total_usuarios']} usuarios, {ab_analysis['control']['total_conversiones']} conversiones, ${ab_analysis['control']['total_revenue']:.2f} revenue
-        - Experimento A: {ab_analysis['experiment']['total_usuarios']} usuarios, {ab_analysis['experiment']['total_conversiones']} conversiones, ${ab_analysis['experiment']['total_revenue']:.2f} revenue
-        - Lift en conversión: {ab_analysis['conversion_lift']:.2f}%
-        - Lift en revenue: {ab_analysis['revenue_lift']:.2f}%
-        - Significancia estadística: {'Sí' if ab_analysis['statistical_significance']['is_significant'] else 'No'} (p-value: {ab_analysis['statistical_significance']['p_value']:.4f})
+        # Búsqueda vectorial (incluye el embedding de la consulta), búsqueda por
+        # atributos y análisis general se ejecutan de forma concurrente
+        relevant_data, attribute_data, context_prefix = await asyncio.gather(
+            asyncio.to_thread(self.find_similar_data, user_query, filters),
+            asyncio.to_thread(self.query_by_attributes, **filters) if filters else asyncio.sleep(0, result=[]),
+            asyncio.to_thread(self._get_context_prefix)
+        )
         
-        DATOS MÁS RELEVANTES PARA LA CONSULTA (usando búsqueda vectorial):
-        """
+        # Crear contexto para OpenAI: prefijo fijo + datos de esta consulta
+        context = context_prefix
         
         for item in relevant_data:
-            context += f"\n{item['description']} (Similitud: {item['similarity']:.3f})\n"
+            context += f"\n{self._snippet(item['description'])} (Similitud: {item['similarity']:.3f})\n"
         
         if attribute_data:
             context += "\nDATOS FILTRADOS POR ATRIBUTOS:\n"
             for item in attribute_data[:5]:  # Limitar a 5 resultados
-                context += f"\n{item['description']}\n"
+                context += f"\n{self._snippet(item['description'])}\n"
         
         context += f"""
         
@@ -302,44 +440,61 @@ class ABTestingChatbot:
         PREGUNTA: {user_query}
         """
         
-        response = self.client.chat.completions.create(
+        stream = await self.async_client.chat.completions.create(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "Eres un analista experto en AB Testing. Proporciona respuestas claras, precisas y basadas en datos."},
                 {"role": "user", "content": context}
             ],
-            temperature=0.3
+            temperature=0.3,
+            stream=True
         )
         
-        return response.choices[0].message.content
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+        
+        return "".join(parts)
+    
+    @staticmethod
+    def _snippet(description: str) -> str:
+        """Compacta espacios y recorta una descripción para el prompt"""
+        return WHITESPACE_PATTERN.sub(' ', description).strip()[:SNIPPET_MAX_CHARS]
     
     def extract_filters_from_query(self, query: str) -> Dict:
         """Extrae filtros potenciales de la consulta del usuario"""
-        filters = {}
         query_lower = query.lower()
         
-        # Detectar experimento
-        if 'control' in query_lower:
-            filters['experimento'] = 'Control'
-        elif 'experimento' in query_lower or 'variante' in query_lower:
-            filters['experimento'] = 'Experimento_A'
-        
-        # Detectar región
-        regions = ['este', 'norte', 'sur', 'oeste']
-        for region in regions:
-            if region in query_lower:
-                filters['region'] = region.capitalize()
-                break
-        
-        # Detectar tipo de tienda
-        if 'mall' in query_lower:
-            filters['tipo_tienda'] = 'Mall'
-        elif 'street' in query_lower or 'calle' in query_lower:
-            filters['tipo_tienda'] = 'Street'
-        elif 'outlet' in query_lower:
-            filters['tipo_tienda'] = 'Outlet'
-        
-        return filters
+        # Una sola pasada sobre la consulta con el autómata; sin él, con la alternación precompilada.
+        # En ambos casos solo cuentan las palabras completas
+        if FILTER_AUTOMATON is not None:
+            matches = (
+                target for end, (length, target) in FILTER_AUTOMATON.iter(query_lower)
+                if self._is_whole_word(query_lower, end - length + 1, end + 1)
+            )
+        else:
+            matches = (FILTER_KEYWORDS[keyword] for keyword in FILTER_KEYWORD_PATTERN.findall(query_lower))
+        
+        best_matches = {}
+        for field, value, priority in matches:
+            if field not in best_matches or priority < best_matches[field][1]:
+                best_matches[field] = (value, priority)
+        
+        return {field: best_matches[field][0] for field in FILTER_FIELDS if field in best_matches}
+    
+    @staticmethod
+    def _is_whole_word(text: str, start: int, end: int) -> bool:
+        """True si text[start:end] no está pegado a otras letras por ninguno de los dos lados"""
+        return (
+            (start == 0 or not WORD_CHAR_PATTERN.match(text, start - 1))
+            and (end == len(text) or not WORD_CHAR_PATTERN.match(text, end))
+        )
     
     def run_console_chat(self):
         """Ejecuta el chatbot en consola"""
@@ -349,8 +504,11 @@ class ABTestingChatbot:
         print(f"Total de registros: {len(self.data)}")
         print("Escribe 'salir' para terminar.\n")
         
+        # prompt_toolkit aporta historial y edición de línea; si no está, input() normal
+        read_input = PromptSession().prompt if PromptSession else input
+        
         while True:
-            user_input = input("📊 Tu pregunta: ").strip()
+            user_input = read_input("📊 Tu pregunta: ").strip()
             
             if user_input.lower() in ['salir', 'exit', 'quit']:
                 print("¡Hasta luego! 👋")
@@ -361,8 +519,12 @@ class ABTestingChatbot:
             
             print("\n🔄 Procesando...")
             try:
-                response = self.generate_response(user_input)
-                print(f"\n🤖 Respuesta:\n{response}\n")
+                print("\n🤖 Respuesta:")
+                self.generate_response(
+                    user_input,
+                    on_token=lambda token: print(token, end="", flush=True)
+                )
+                print("\n")
                 print("-" * 50)
             except Exception as e:
                 print(f"❌ Error: {str(e)}")
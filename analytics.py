@@ -1,27 +1,104 @@
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from scipy import stats
 import numpy as np
+import warnings
+
+def welch_t_test(control: np.ndarray, experiment: np.ndarray, axis: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    """Welch t-test en forma cerrada con numpy (ignora NaN, vectorizado sobre `axis`)"""
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return welch_t_test_from_moments(
+            np.count_nonzero(~np.isnan(control), axis=axis),
+            np.nanmean(control, axis=axis),
+            np.nanvar(control, axis=axis, ddof=1),
+            np.count_nonzero(~np.isnan(experiment), axis=axis),
+            np.nanmean(experiment, axis=axis),
+            np.nanvar(experiment, axis=axis, ddof=1)
+        )
+
+def welch_t_test_from_moments(n1, mean1, var1, n2, mean2, var2) -> Tuple[np.ndarray, np.ndarray]:
+    """Welch t-test a partir de tamaño, media y varianza muestral de cada grupo"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se1 = var1 / n1
+        se2 = var2 / n2
+        
+        t_stat = (mean1 - mean2) / np.sqrt(se1 + se2)
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    
+    return t_stat, p_value
+
+def chi_square_2x2(a: float, b: float, c: float, d: float) -> Tuple[float, float]:
+    """Chi-square de la tabla [[a, b], [c, d]] con corrección de continuidad de Yates"""
+    # Aritmética en float para que los productos no desborden con conteos enteros grandes
+    a, b, c, d = float(a), float(b), float(c), float(d)
+    n = a + b + c + d
+    denominator = (a + b) * (c + d) * (a + c) * (b + d)
+    if denominator == 0:
+        return 0.0, 1.0
+    
+    corrected = max(abs(a * d - b * c) - n / 2, 0)
+    chi2 = n * corrected ** 2 / denominator
+    return chi2, stats.chi2.sf(chi2, 1)
 
 class ABTestingAnalytics:
     """Analizador estadístico para experimentos AB Testing"""
     
+    # Precisión reducida para los arrays de los tests: FP32 basta para tasas y revenue
+    METRIC_DTYPES = {
+        'usuarios': np.int32,
+        'conversiones': np.int32,
+        'revenue': np.float32,
+        'conversion_rate': np.float32
+    }
+    
+    CATEGORY_COLUMNS = ('experimento', 'region', 'tipo_tienda')
+    SEGMENT_COLUMNS = ('region', 'tipo_tienda')
+    
     def __init__(self, data: pd.DataFrame):
         self.data = data
+        
+        # Códigos enteros de las columnas categóricas y arrays de métricas (una sola vez)
+        self._codes = {}
+        self._labels = {}
+        for column in self.CATEGORY_COLUMNS:
+            self._codes[column], self._labels[column] = pd.factorize(data[column])
+        # Buffers 1-D contiguos (aunque `data` sea un slice) para reducciones sobre memoria contigua
+        self._arrays = {
+            column: np.ascontiguousarray(data[column].to_numpy())
+            for column in self.METRIC_DTYPES
+        }
+        
+        # Índices de fila por experimento, reutilizados en lugar de máscaras booleanas
+        self._experiment_rows = {
+            experiment: np.flatnonzero(self._codes['experimento'] == code)
+            for code, experiment in enumerate(self._labels['experimento'])
+        }
+        
+        # Arrays numpy por experimento (SoA) precalculados para los tests estadísticos
+        self._group_arrays = {
+            experiment: {
+                column: self._arrays[column].take(rows).astype(dtype, copy=False)
+                for column, dtype in self.METRIC_DTYPES.items()
+            }
+            for experiment, rows in self._experiment_rows.items()
+        }
     
     def analyze_ab_test_results(self) -> Dict[str, Any]:
         """Analiza los resultados completos del AB Testing"""
-        control_data = self.data[self.data['experimento'] == 'Control']
+        # Un único groupby reemplaza las máscaras booleanas por experimento
+        grouped = self.data.groupby('experimento', sort=False, observed=True)
+        metrics_by_experiment = self._aggregate_metrics(grouped)
         
-        # Obtener todos los grupos de experimento
-        experiment_groups = self.data[self.data['experimento'] != 'Control']['experimento'].unique()
-        
-        results = {'control': self._calculate_metrics(control_data)}
+        # Sin filas de Control se compara contra un grupo vacío (métricas NaN/0), como el análisis original
+        control_arrays = self._group_arrays.get('Control') or self._empty_group_arrays()
+        results = {'control': metrics_by_experiment.get('Control') or self._empty_group_metrics()}
         
         # Analizar cada experimento vs control
-        for experiment_name in experiment_groups:
-            experiment_data = self.data[self.data['experimento'] == experiment_name]
-            experiment_metrics = self._calculate_metrics(experiment_data)
+        for experiment_name, experiment_metrics in metrics_by_experiment.items():
+            if experiment_name == 'Control':
+                continue
             
             # Calcular lifts
             conversion_lift = self._calculate_lift(
@@ -35,7 +112,9 @@ class ABTestingAnalytics:
             )
             
             # Test de significancia estadística
-            statistical_test = self._perform_statistical_test(control_data, experiment_data)
+            statistical_test = self._perform_statistical_test(
+                control_arrays, self._group_arrays[experiment_name]
+            )
             
             results[experiment_name] = {
                 'metrics': experiment_metrics,
@@ -45,8 +124,9 @@ class ABTestingAnalytics:
             }
         
         # Análisis por segmentos (usando todos los datos)
-        regional_analysis = self._analyze_by_region()
-        store_type_analysis = self._analyze_by_store_type()
+        segment_analysis = self._analyze_segments()
+        regional_analysis = segment_analysis['region']
+        store_type_analysis = segment_analysis['tipo_tienda']
         
         results.update({
             'regional_analysis': regional_analysis,
@@ -56,17 +136,39 @@ class ABTestingAnalytics:
         
         return results
     
-    def _calculate_metrics(self, data: pd.DataFrame) -> Dict[str, float]:
-        """Calcula métricas para un grupo de datos"""
+    def _aggregate_metrics(self, grouped) -> Dict[str, Dict[str, float]]:
+        """Calcula las métricas de todos los grupos en una sola agregación"""
+        aggregated = grouped.agg(
+            total_usuarios=('usuarios', 'sum'),
+            total_conversiones=('conversiones', 'sum'),
+            total_revenue=('revenue', 'sum'),
+            avg_conversion_rate=('conversion_rate', 'mean'),
+            median_conversion_rate=('conversion_rate', 'median'),
+            std_conversion_rate=('conversion_rate', 'std')
+        )
+        aggregated['avg_revenue_per_user'] = aggregated['total_revenue'] / aggregated['total_usuarios']
+        aggregated['avg_revenue_per_conversion'] = (
+            aggregated['total_revenue'] / aggregated['total_conversiones']
+        ).where(aggregated['total_conversiones'] > 0, 0)
+        
+        return aggregated.to_dict(orient='index')
+    
+    def _empty_group_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays de métricas de un grupo sin filas"""
+        return {column: np.empty(0, dtype=dtype) for column, dtype in self.METRIC_DTYPES.items()}
+    
+    @staticmethod
+    def _empty_group_metrics() -> Dict[str, float]:
+        """Métricas de un grupo sin filas: totales a 0 y estadísticos indefinidos (NaN)"""
         return {
-            'total_usuarios': data['usuarios'].sum(),
-            'total_conversiones': data['conversiones'].sum(),
-            'total_revenue': data['revenue'].sum(),
-            'avg_conversion_rate': data['conversion_rate'].mean(),
-            'median_conversion_rate': data['conversion_rate'].median(),
-            'std_conversion_rate': data['conversion_rate'].std(),
-            'avg_revenue_per_user': data['revenue'].sum() / data['usuarios'].sum(),
-            'avg_revenue_per_conversion': data['revenue'].sum() / data['conversiones'].sum() if data['conversiones'].sum() > 0 else 0
+            'total_usuarios': 0,
+            'total_conversiones': 0,
+            'total_revenue': 0.0,
+            'avg_conversion_rate': np.nan,
+            'median_conversion_rate': np.nan,
+            'std_conversion_rate': np.nan,
+            'avg_revenue_per_user': np.nan,
+            'avg_revenue_per_conversion': 0
         }
     
     def _calculate_lift(self, experiment_value: float, control_value: float) -> float:
@@ -75,29 +177,28 @@ class ABTestingAnalytics:
             return 0
         return ((experiment_value - control_value) / control_value) * 100
     
-    def _perform_statistical_test(self, control_data: pd.DataFrame, 
-                                 experiment_data: pd.DataFrame) -> Dict[str, Any]:
-        """Realiza test de significancia estadística"""
+    def _perform_statistical_test(self, control_arrays: Dict[str, np.ndarray], 
+                                 experiment_arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """Realiza test de significancia estadística sobre arrays precalculados"""
         
-        # T-test para conversion rates
-        control_rates = control_data['conversion_rate'].values
-        experiment_rates = experiment_data['conversion_rate'].values
-        
-        t_stat, p_value = stats.ttest_ind(control_rates, experiment_rates)
+        # T-test (Welch) para conversion rates
+        t_stat, p_value = welch_t_test(
+            control_arrays['conversion_rate'], experiment_arrays['conversion_rate']
+        )
         
         # Chi-square test para proporciones
-        control_conversions = control_data['conversiones'].sum()
-        control_users = control_data['usuarios'].sum()
-        experiment_conversions = experiment_data['conversiones'].sum()
-        experiment_users = experiment_data['usuarios'].sum()
-        
-        # Tabla de contingencia para chi-square
-        observed = np.array([
-            [control_conversions, control_users - control_conversions],
-            [experiment_conversions, experiment_users - experiment_conversions]
-        ])
-        
-        chi2, chi2_p_value, dof, expected = stats.chi2_contingency(observed)
+        # Acumular en 64 bits para evitar overflow en los totales
+        control_conversions = control_arrays['conversiones'].sum(dtype=np.int64)
+        control_users = control_arrays['usuarios'].sum(dtype=np.int64)
+        experiment_conversions = experiment_arrays['conversiones'].sum(dtype=np.int64)
+        experiment_users = experiment_arrays['usuarios'].sum(dtype=np.int64)
+        
+        # Chi-square 2x2 en forma cerrada (con corrección de Yates, como chi2_contingency)
+        chi2, chi2_p_value = chi_square_2x2(
+            control_conversions, control_users - control_conversions,
+            experiment_conversions, experiment_users - experiment_conversions
+        )
+        dof = 1
         
         return {
             't_test': {
@@ -115,55 +216,78 @@ class ABTestingAnalytics:
             'overall_significance': p_value < 0.05 and chi2_p_value < 0.05
         }
     
-    def _analyze_by_region(self) -> Dict[str, Dict]:
-        """Analiza resultados por región"""
-        regional_results = {}
-        
-        for region in self.data['region'].unique():
-            region_data = self.data[self.data['region'] == region]
-            control_region = region_data[region_data['experimento'] == 'Control']
-            experiment_region = region_data[region_data['experimento'] == 'Experimento_A']
-            
-            if len(control_region) > 0 and len(experiment_region) > 0:
-                control_cr = control_region['conversion_rate'].mean()
-                experiment_cr = experiment_region['conversion_rate'].mean()
-                
-                regional_results[region] = {
-                    'control_conversion_rate': control_cr,
-                    'experiment_conversion_rate': experiment_cr,
-                    'lift': self._calculate_lift(experiment_cr, control_cr),
-                    'control_revenue': control_region['revenue'].sum(),
-                    'experiment_revenue': experiment_region['revenue'].sum(),
-                    'sample_size_control': len(control_region),
-                    'sample_size_experiment': len(experiment_region)
-                }
+    def _analyze_segments(self) -> Dict[str, Dict[str, Dict]]:
+        """Compara Control vs Experimento_A por región y por tipo de tienda en una única pasada"""
+        experiments = self._labels['experimento']
+        if 'Control' not in experiments or 'Experimento_A' not in experiments:
+            return {column: {} for column in self.SEGMENT_COLUMNS}
+        
+        # Un id de grupo por fila sobre (experimento, región, tipo de tienda). Los valores ausentes
+        # (código -1 de factorize) van a una posición extra al final de su eje: no forman segmento
+        # propio, pero la fila sigue contando en la vista de la otra dimensión (como en el original)
+        shape = tuple(len(self._labels[column]) + 1 for column in self.CATEGORY_COLUMNS)
+        group_ids = np.ravel_multi_index(
+            tuple(
+                np.where(self._codes[column] >= 0, self._codes[column], size - 1)
+                for column, size in zip(self.CATEGORY_COLUMNS, shape)
+            ),
+            shape
+        )
+        n_groups = int(np.prod(shape))
+        
+        # Sumas por grupo
+        moments = {
+            'count': np.bincount(group_ids, minlength=n_groups),
+            'rate_sum': np.bincount(group_ids, weights=self._arrays['conversion_rate'], minlength=n_groups),
+            'revenue_sum': np.bincount(group_ids, weights=self._arrays['revenue'], minlength=n_groups)
+        }
+        moments = {name: values.reshape(shape) for name, values in moments.items()}
         
-        return regional_results
+        control_code = experiments.get_loc('Control')
+        experiment_code = experiments.get_loc('Experimento_A')
+        
+        # Cada vista suma sobre el eje de la otra dimensión de segmentación
+        return {
+            'region': self._segment_results(
+                self._labels['region'],
+                {name: values.sum(axis=2) for name, values in moments.items()},
+                control_code, experiment_code
+            ),
+            'tipo_tienda': self._segment_results(
+                self._labels['tipo_tienda'],
+                {name: values.sum(axis=1) for name, values in moments.items()},
+                control_code, experiment_code
+            )
+        }
     
-    def _analyze_by_store_type(self) -> Dict[str, Dict]:
-        """Analiza resultados por tipo de tienda"""
-        store_type_results = {}
-        
-        for store_type in self.data['tipo_tienda'].unique():
-            store_data = self.data[self.data['tipo_tienda'] == store_type]
-            control_store = store_data[store_data['experimento'] == 'Control']
-            experiment_store = store_data[store_data['experimento'] == 'Experimento_A']
+    def _segment_results(self, segments, moments: Dict[str, np.ndarray],
+                         control_code: int, experiment_code: int) -> Dict[str, Dict]:
+        """Construye el análisis por segmento a partir de sumas (experimento x segmento)"""
+        counts = moments['count']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate_means = moments['rate_sum'] / counts
+        
+        segment_results = {}
+        
+        for segment_code, segment in enumerate(segments):
+            control_count = counts[control_code, segment_code]
+            experiment_count = counts[experiment_code, segment_code]
             
-            if len(control_store) > 0 and len(experiment_store) > 0:
-                control_cr = control_store['conversion_rate'].mean()
-                experiment_cr = experiment_store['conversion_rate'].mean()
+            if control_count > 0 and experiment_count > 0:
+                control_cr = rate_means[control_code, segment_code]
+                experiment_cr = rate_means[experiment_code, segment_code]
                 
-                store_type_results[store_type] = {
+                segment_results[segment] = {
                     'control_conversion_rate': control_cr,
                     'experiment_conversion_rate': experiment_cr,
                     'lift': self._calculate_lift(experiment_cr, control_cr),
-                    'control_revenue': control_store['revenue'].sum(),
-                    'experiment_revenue': experiment_store['revenue'].sum(),
-                    'sample_size_control': len(control_store),
-                    'sample_size_experiment': len(experiment_store)
+                    'control_revenue': moments['revenue_sum'][control_code, segment_code],
+                    'experiment_revenue': moments['revenue_sum'][experiment_code, segment_code],
+                    'sample_size_control': int(control_count),
+                    'sample_size_experiment': int(experiment_count)
                 }
         
-        return store_type_results
+        return segment_results
     
     def _generate_summary(self, control_metrics: Dict, experiment_metrics: Dict,
                          conversion_lift: float, revenue_lift: float,
@@ -4,66 +4,262 @@ Versión modular siguiendo mejores prácticas
 """
 
 from superlinked.framework.dsl.executor.in_memory.in_memory_executor import InMemoryExecutor
-from openai import OpenAI
-from typing import Dict, List, Any
+from openai import AsyncOpenAI
+from typing import Dict, List, Any, Optional, Callable
+from functools import cached_property
+from collections import OrderedDict
+import asyncio
+import hashlib
+import httpx
+import json
+import logging
+import re
 import sys
+import threading
 import traceback
+from importlib import metadata
+from pathlib import Path
 
 # Imports de módulos locales
 from config import settings
-from index import create_ab_testing_index
-from query import ABTestingQueryEngine
-from data_processing import ABTestingDataProcessor
+from index import create_ab_testing_index, index_config_fingerprint
+from query import ABTestingQueryEngine, SearchResult, TopPerformers, extract_filters_from_query
+from data_processing import ABTestingDataProcessor, DESC_TMPL
 from analytics import ABTestingAnalytics
 from intent_router import IntentRouter
+from event_loop import run_coroutine
+from vector_search import (
+    install_batched_search,
+    persist_index,
+    restore_index,
+    evict_stale_caches
+)
+
+# El índice se construye en un hilo de fondo mientras la consola espera la pregunta:
+# sus mensajes van a este logger (silencioso salvo que la aplicación configure logging)
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Respuestas del LLM memoizadas por consulta normalizada
+RESPONSE_CACHE_SIZE = 256
+
+# Resultados de cada búsqueda incluidos en el contexto enviado a OpenAI
+CONTEXT_RESULTS = 3
+
+# Índices persistidos que se conservan en disco (uno por versión del CSV)
+INDEX_CACHE_ENTRIES = 3
+
+# Versión del análisis persistido en disco (JSON): subirla cuando cambie la estructura
+# devuelta por ABTestingAnalytics para no reutilizar ficheros antiguos
+ANALYSIS_CACHE_VERSION = 2
+
+# Versión del formato del índice persistido: subirla invalida los índices guardados.
+# La persistencia usa el conector interno del VDB de Superlinked, así que la versión
+# instalada de Superlinked también forma parte de la clave
+INDEX_FORMAT_VERSION = 1
+try:
+    SUPERLINKED_VERSION = metadata.version("superlinked")
+except metadata.PackageNotFoundError:
+    SUPERLINKED_VERSION = "unknown"
+
+# Consulta usada para precalentar el modelo de embeddings al arrancar
+WARMUP_QUERY = "rendimiento del experimento por región"
+
+# Palabras clave como constantes de módulo (se construyen una sola vez al importar)
+PERFORMANCE_KEYWORDS = frozenset({
+    "mayor", "menor", "máximo", "mínimo", "mejor", "peor",
+    "top", "ranking", "más alto", "más bajo", "highest", "lowest",
+    "best", "worst", "máx", "mín"
+})
+REVENUE_KEYWORDS = frozenset({"revenue", "ingreso", "ganancia"})
+USERS_KEYWORDS = frozenset({"usuario", "users", "tráfico"})
+CONVERSION_KEYWORDS = frozenset({"conversion", "conversión"})
+ASCENDING_KEYWORDS = frozenset({"menor", "mínimo", "peor", "lowest", "worst", "mín"})
+# Preguntas sobre el resultado global del test: las responde el análisis completo
+SUMMARY_KEYWORDS = frozenset({
+    "resumen", "general", "global", "lift", "significativ", "significancia",
+    "p-value", "p valor", "valor p", "ganador", "summary", "overall"
+})
+
+def _keyword_pattern(keywords: frozenset) -> re.Pattern:
+    """Compila las palabras clave en una sola alternancia (una pasada del motor de regex).
+    
+    Solo se ancla el inicio de palabra para seguir aceptando plurales ("usuarios", "mayores").
+    """
+    alternatives = sorted(keywords, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, alternatives)) + ")")
+
+PERFORMANCE_PATTERN = _keyword_pattern(PERFORMANCE_KEYWORDS)
+REVENUE_PATTERN = _keyword_pattern(REVENUE_KEYWORDS)
+USERS_PATTERN = _keyword_pattern(USERS_KEYWORDS)
+CONVERSION_PATTERN = _keyword_pattern(CONVERSION_KEYWORDS)
+ASCENDING_PATTERN = _keyword_pattern(ASCENDING_KEYWORDS)
+SUMMARY_PATTERN = _keyword_pattern(SUMMARY_KEYWORDS)
+
+# Cliente OpenAI compartido por todas las instancias del chatbot (vive en el event loop de event_loop).
+# El pool de conexiones arranca vacío y abre conexiones bajo demanda
+_OPENAI_CLIENT: Optional[AsyncOpenAI] = None
+
+def get_openai_client() -> AsyncOpenAI:
+    """Devuelve el cliente AsyncOpenAI compartido, creándolo en la primera llamada"""
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        _OPENAI_CLIENT = AsyncOpenAI(
+            api_key=settings.openai_api_key.get_secret_value(),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                timeout=httpx.Timeout(600.0, connect=5.0)
+            )
+        )
+    return _OPENAI_CLIENT
 
 class ABTestingChatbotV2:
     """Chatbot de AB Testing refactorizado con arquitectura modular"""
     
     def __init__(self):
-        print("🚀 Inicializando Chatbot de AB Testing v2.0...")
+        # Mensajes de arranque acumulados y escritos de una sola vez al final
+        self._startup_log: List[str] = ["🚀 Inicializando Chatbot de AB Testing v2.0..."]
         
         # Configuración
         self.settings = settings
-        self.openai_client = OpenAI(api_key=settings.openai_api_key.get_secret_value())
         
         # Procesamiento de datos
-        print("📊 Cargando y procesando datos...")
+        self._startup_log.append("📊 Cargando y procesando datos...")
         self.data_processor = ABTestingDataProcessor()
         self.analytics = ABTestingAnalytics(self.data_processor.data)
         
-        # Crear índice Superlinked
-        print("🔍 Creando índice vectorial Superlinked...")
-        self.index, self.schema, self.spaces = create_ab_testing_index()
+        # Router de intents (camino rápido: no necesita índice ni OpenAI).
+        # Cliente OpenAI, índice Superlinked y motor de consultas se crean en el primer uso
+        self.intent_router = IntentRouter(self.data_processor, self.settings)
         
-        # Configurar source y executor
+        # Cache de análisis
+        self._ab_analysis_cache = None
+        
+        # Rankings por métrica: solo usan el DataFrame, no esperan al índice ni al modelo
+        self.top_performers = TopPerformers(self.data_processor)
+        
+        # Motor de consultas: lo construye el primero que lo necesite (usuario o precalentamiento)
+        self._query_engine = None
+        self._index_lock = threading.Lock()
+        
+        # Cache LRU por instancia de respuestas: (consulta normalizada, id de los datos) -> respuesta
+        self._response_cache: OrderedDict = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        self._response_cache_hits = 0
+        self._response_cache_misses = 0
+        
+        self._startup_log.append("✅ Chatbot inicializado correctamente!")
+        # El resumen solo tiene sentido en una consola interactiva (no en despliegues headless)
+        if sys.stdout.isatty():
+            self._startup_log.append(self._format_data_summary())
+        sys.stdout.write("\n".join(self._startup_log) + "\n")
+        sys.stdout.flush()
+        
+        # Índice, carga del modelo de embeddings e indexación en segundo plano
+        # mientras el usuario escribe su primera pregunta
+        threading.Thread(target=self._prewarm, daemon=True).start()
+    
+    @cached_property
+    def openai_client(self) -> AsyncOpenAI:
+        """Cliente OpenAI compartido (se crea en la primera consulta que lo necesita)"""
+        return get_openai_client()
+    
+    @classmethod
+    def close(cls):
+        """Cierra el cliente OpenAI compartido y su pool de conexiones"""
+        global _OPENAI_CLIENT
+        if _OPENAI_CLIENT is not None:
+            run_coroutine(_OPENAI_CLIENT.close())
+            _OPENAI_CLIENT = None
+    
+    @cached_property
+    def _index_components(self) -> tuple:
+        """Índice Superlinked, schema y espacios (reutiliza el schema del procesador de datos)"""
+        logger.info("🔍 Creando índice vectorial Superlinked...")
+        return create_ab_testing_index(self.data_processor.schema)
+    
+    @cached_property
+    def index(self):
+        return self._index_components[0]
+    
+    @cached_property
+    def schema(self):
+        return self._index_components[1]
+    
+    @cached_property
+    def spaces(self) -> Dict:
+        return self._index_components[2]
+    
+    @cached_property
+    def app(self):
+        """Executor en memoria en marcha, con todos los documentos indexados"""
         from superlinked.framework.dsl.source.in_memory_source import InMemorySource
         
+        # Configurar source y executor
         self.source = InMemorySource(self.schema)
+        # Similitudes por lotes (matmul) en el VDB en memoria, opcionalmente en int8
+        if not install_batched_search(quantize=self.settings.int8_embeddings):
+            # El parche es global al proceso: otro chatbot ya fijó el modo (o Superlinked no lo admite)
+            logger.warning(
+                "⚠️  No se pudo activar la búsqueda por lotes con int8_embeddings=%s; "
+                "se mantiene la búsqueda ya instalada", self.settings.int8_embeddings
+            )
         self.executor = InMemoryExecutor(sources=[self.source], indices=[self.index])
-        self.app = self.executor.run()
+        app = self.executor.run()
+        
+        # Índice persistido para esta misma versión del CSV: evita re-embeber todo al arrancar
+        cache_dir = Path(self.settings.cache_dir)
+        index_dir = cache_dir / self._index_cache_key()
+        if restore_index(app, index_dir):
+            logger.info("♻️  Índice vectorial restaurado desde cache")
+            return app
         
         # Indexar documentos
+        logger.info("🔄 Indexando documentos (sin cache de índice)...")
         documents = self.data_processor.prepare_documents()
         if documents:
             self.source.put(documents)
+            try:
+                if persist_index(app, index_dir):
+                    evict_stale_caches(cache_dir, "index-*", keep=INDEX_CACHE_ENTRIES)
+            except OSError as e:
+                logger.warning("⚠️  No se pudo guardar la cache del índice: %s", e)
         
-        # Motor de consultas
-        self.query_engine = ABTestingQueryEngine(self.index, self.schema, self.spaces, self.app)
-        
-        # Router de intents
-        self.intent_router = IntentRouter(self.data_processor, self.settings)
-        
-        # Cache de análisis
-        self._ab_analysis_cache = None
-        
-        print("✅ Chatbot inicializado correctamente!")
-        self._print_data_summary()
+        return app
+    
+    def _index_cache_key(self) -> str:
+        """Nombre del índice persistido: formato, Superlinked, espacios/modelo/pesos, plantilla de
+        descripción y huella del CSV (cualquier cambio en ellos obliga a reindexar)"""
+        components = "|".join((
+            str(INDEX_FORMAT_VERSION), SUPERLINKED_VERSION, index_config_fingerprint(), DESC_TMPL
+        ))
+        digest = hashlib.sha256(components.encode()).hexdigest()[:12]
+        return f"index-v{INDEX_FORMAT_VERSION}-{digest}-{self.data_processor.csv_fingerprint}"
+    
+    @property
+    def query_engine(self) -> ABTestingQueryEngine:
+        """Motor de consultas sobre el índice (dispara la creación del índice una sola vez)"""
+        if self._query_engine is None:
+            with self._index_lock:
+                if self._query_engine is None:
+                    self._query_engine = ABTestingQueryEngine(
+                        self.index, self.schema, self.spaces, self.app,
+                        data_processor=self.data_processor,
+                        top_performers=self.top_performers
+                    )
+        return self._query_engine
+    
+    def _prewarm(self):
+        """Construye el índice (todas las descripciones en un único put) y ejecuta una búsqueda de calentamiento"""
+        try:
+            self.query_engine.semantic_search(WARMUP_QUERY, limit=1)
+        except Exception as e:
+            logger.warning("⚠️  Precalentamiento incompleto: %s", e)
     
-    def _print_data_summary(self):
-        """Imprime resumen de los datos cargados"""
+    def _format_data_summary(self) -> str:
+        """Resumen de los datos cargados"""
         summary = self.data_processor.get_data_summary()
-        print(f"""
+        return f"""
 📈 DATOS CARGADOS:
 • Total registros: {summary['total_records']}
 • Experimentos: {', '.join(summary['experiments'])}
@@ -72,104 +268,221 @@ class ABTestingChatbotV2:
 • Total usuarios: {summary['total_users']:,}
 • Total conversiones: {summary['total_conversions']:,}
 • Revenue total: ${summary['total_revenue']:,.2f}
-""")
+"""
     
     def get_ab_analysis(self) -> Dict[str, Any]:
-        """Obtiene análisis completo de AB Testing (con cache)"""
+        """Obtiene análisis completo de AB Testing (con cache en memoria y en disco)"""
         if self._ab_analysis_cache is None:
-            self._ab_analysis_cache = self.analytics.analyze_ab_test_results()
+            self._ab_analysis_cache = self._load_or_compute_analysis()
         return self._ab_analysis_cache
     
-    def generate_response(self, user_query: str) -> str:
-        """Genera respuesta usando OpenAI con contexto enriquecido"""
+    def _load_or_compute_analysis(self) -> Dict[str, Any]:
+        """Reutiliza el análisis persistido para este mismo CSV (mtime + hash) o lo recalcula
+        
+        Se guarda como JSON (solo diccionarios, números y textos): leer la cache no ejecuta
+        código aunque alguien modifique los ficheros de cache_dir.
+        """
+        cache_path = Path(self.settings.cache_dir) / (
+            f"ab_analysis_v{ANALYSIS_CACHE_VERSION}_{self.data_processor.csv_fingerprint}.json"
+        )
+        
+        if cache_path.exists():
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️  Cache de análisis inválida, se recalcula: %s", e)
+        
+        analysis = self.analytics.analyze_ab_test_results()
         try:
-            # Usar el router de intents para consultas simples
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                # Los escalares numpy (np.float64, np.bool_...) se guardan como su valor de Python
+                json.dump(analysis, f, ensure_ascii=False, default=lambda value: value.item())
+        except (OSError, TypeError, AttributeError) as e:
+            logger.warning("⚠️  No se pudo guardar la cache de análisis: %s", e)
+        return analysis
+    
+    def generate_response(self, user_query: str,
+                          on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Genera respuesta usando OpenAI con contexto enriquecido
+        
+        Si la respuesta sale del LLM, `on_token` recibe cada fragmento a medida que llega;
+        las respuestas del router o de la cache se devuelven completas sin invocarlo.
+        """
+        try:
+            # Usar el router de intents para consultas simples (ya es rápido, no se cachea)
             simple_response = self.intent_router.route_query(user_query)
             if simple_response:
                 return simple_response
             
-            # Extraer filtros automáticamente
-            filters = self.query_engine.extract_filters_from_query(user_query)
-            
-            # Detectar si es una consulta de performance (mayor/menor/top/mejor)
-            performance_results = []
-            if self._is_performance_query(user_query):
-                performance_results = self._handle_performance_query(user_query, filters)
+            # Variantes que solo difieren en mayúsculas/espacios comparten entrada;
+            # el id de los datos invalida la cache si se recargan
+            normalized_query = " ".join(user_query.lower().split())
+            cache_key = (normalized_query, id(self.data_processor.data))
+            cached_response = self._get_cached_response(cache_key)
+            if cached_response is not None:
+                return cached_response
             
-            # Búsqueda semántica
-            semantic_results = self.query_engine.semantic_search(
-                user_query, 
-                filters=filters,
-                limit=self.settings.default_limit
-            )
-            
-            # Búsqueda por filtros si los hay
-            filter_results = []
-            if filters:
-                filter_results = self.query_engine.filter_search(**filters)
-            
-            # Obtener análisis completo
-            ab_analysis = self.get_ab_analysis()
+            # La consulta normalizada es solo la clave: el prompt usa el texto original.
+            # El callback no forma parte de la clave: solo se usa si la respuesta se genera.
+            # Event loop compartido: el cliente async reutiliza su pool de conexiones entre turnos
+            response = run_coroutine(self._compose_response(user_query, on_token))
+            # Los errores se propagan antes de llegar aquí y no se cachean
+            self._store_cached_response(cache_key, response)
+            return response
             
-            # Crear contexto enriquecido
-            context = self._build_context(user_query, semantic_results, filter_results, ab_analysis, performance_results)
-            
-            # Generar respuesta con OpenAI
-            response = self.openai_client.chat.completions.create(
-                model=self.settings.openai_model_id,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": self._get_system_prompt()
-                    },
-                    {
-                        "role": "user", 
-                        "content": context
-                    }
-                ],
-                temperature=0.3,
-                max_tokens=1000
-            )
+        except Exception as e:
+            return self._error_response(e)
+    
+    def _get_cached_response(self, cache_key: tuple) -> Optional[str]:
+        """Respuesta cacheada para la clave (None si no está), marcándola como usada recientemente"""
+        with self._response_cache_lock:
+            response = self._response_cache.get(cache_key)
+            if response is None:
+                self._response_cache_misses += 1
+                return None
+            self._response_cache.move_to_end(cache_key)
+            self._response_cache_hits += 1
+            return response
+    
+    def _store_cached_response(self, cache_key: tuple, response: str):
+        """Guarda la respuesta y descarta la menos usada si se supera RESPONSE_CACHE_SIZE"""
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = response
+            self._response_cache.move_to_end(cache_key)
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+    
+    async def agenerate_response(self, user_query: str,
+                                 on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Versión async: búsquedas y análisis se solapan antes de llamar a OpenAI"""
+        try:
+            # Usar el router de intents para consultas simples
+            simple_response = self.intent_router.route_query(user_query)
+            if simple_response:
+                return simple_response
             
-            return response.choices[0].message.content
+            return await self._compose_response(user_query, on_token)
             
         except Exception as e:
-            error_msg = f"Error generando respuesta: {str(e)}"
-            print(f"❌ {error_msg}")
-            traceback.print_exc()
-            return f"Lo siento, ocurrió un error al procesar tu consulta: {error_msg}"
+            return self._error_response(e)
+    
+    async def _compose_response(self, user_query: str,
+                                on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Búsquedas concurrentes + contexto enriquecido + llamada a OpenAI"""
+        # Extraer filtros automáticamente (función pura: no carga el índice)
+        filters = extract_filters_from_query(user_query)
+        query_lower = user_query.lower()
+        query_type = self._classify_query(query_lower, filters)
+        
+        # Con filtros se piden también las filas de la sección de datos filtrados
+        # (CONTEXT_RESULTS relevantes + CONTEXT_RESULTS filtrados)
+        search_limit = self.settings.default_limit
+        if query_type == "filter":
+            search_limit = max(search_limit, CONTEXT_RESULTS * 2)
+        
+        # Solo se ejecutan las ramas que el tipo de consulta necesita; las que
+        # quedan son independientes y se solapan entre sí
+        performance_results, semantic_results, ab_analysis = await asyncio.gather(
+            asyncio.to_thread(self._handle_performance_query, query_lower, filters)
+            if query_type == "performance" else asyncio.sleep(0, result=[]),
+            self._asemantic_search(user_query, filters, search_limit) if query_type in ("filter", "semantic") else asyncio.sleep(0, result=[]),
+            asyncio.to_thread(self.get_ab_analysis)
+        )
+        
+        # La búsqueda semántica ya aplica los filtros: en vez de una segunda búsqueda
+        # por filtros, los resultados que no entran entre los más relevantes
+        # alimentan la sección de datos filtrados
+        filter_results = semantic_results[CONTEXT_RESULTS:] if query_type == "filter" else []
+        
+        # Crear contexto enriquecido
+        context = self._build_context(user_query, semantic_results, filter_results, ab_analysis, performance_results)
+        
+        # Generar respuesta con OpenAI en streaming
+        stream = await self.openai_client.chat.completions.create(
+            model=self.settings.openai_model_id,
+            messages=[
+                {
+                    "role": "system", 
+                    "content": self._get_system_prompt()
+                },
+                {
+                    "role": "user", 
+                    "content": context
+                }
+            ],
+            temperature=0.3,
+            max_tokens=1000,
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+        
+        return "".join(parts)
+    
+    async def _asemantic_search(self, user_query: str, filters: Dict, limit: int) -> List[SearchResult]:
+        """Búsqueda semántica; el motor se resuelve en un hilo porque puede esperar al precalentamiento
+        
+        Así la espera del índice no bloquea el event loop compartido con las demás consultas.
+        """
+        query_engine = await asyncio.to_thread(lambda: self.query_engine)
+        return await query_engine.asemantic_search(user_query, filters=filters, limit=limit)
     
-    def _is_performance_query(self, query: str) -> bool:
-        """Detecta si es una consulta de performance/ranking"""
-        query_lower = query.lower()
-        performance_keywords = [
-            "mayor", "menor", "máximo", "mínimo", "mejor", "peor",
-            "top", "ranking", "más alto", "más bajo", "highest", "lowest",
-            "best", "worst", "máx", "mín"
-        ]
-        return any(keyword in query_lower for keyword in performance_keywords)
+    def _error_response(self, e: Exception) -> str:
+        """Mensaje de error mostrado al usuario"""
+        error_msg = f"Error generando respuesta: {str(e)}"
+        print(f"❌ {error_msg}")
+        traceback.print_exc()
+        return f"Lo siento, ocurrió un error al procesar tu consulta: {error_msg}"
     
-    def _handle_performance_query(self, query: str, filters: Dict) -> List[Dict]:
-        """Maneja consultas de performance específicas"""
-        query_lower = query.lower()
+    def _classify_query(self, query_lower: str, filters: Dict) -> str:
+        """Clasifica la consulta en 'performance', 'filter', 'summary' o 'semantic'
         
+        - performance: ranking por métrica (respeta los filtros detectados)
+        - filter: hay filtros -> búsqueda semántica filtrada
+        - summary: pregunta global, basta con el análisis completo (sin embeddings)
+        - semantic: resto de consultas -> búsqueda semántica
+        """
+        if self._is_performance_query(query_lower):
+            return "performance"
+        if filters:
+            return "filter"
+        if SUMMARY_PATTERN.search(query_lower):
+            return "summary"
+        return "semantic"
+    
+    def _is_performance_query(self, query_lower: str) -> bool:
+        """Detecta si es una consulta de performance/ranking (consulta ya en minúsculas)"""
+        return PERFORMANCE_PATTERN.search(query_lower) is not None
+    
+    def _handle_performance_query(self, query_lower: str, filters: Dict) -> List[Dict]:
+        """Maneja consultas de performance específicas (consulta ya en minúsculas)"""
         # Determinar métrica y orden
         metric = 'conversion_rate'  # Default
         order = 'desc'  # Default para "mayor/mejor"
         
-        if any(word in query_lower for word in ["revenue", "ingreso", "ganancia"]):
+        if REVENUE_PATTERN.search(query_lower):
             metric = 'revenue'
-        elif any(word in query_lower for word in ["usuario", "users", "tráfico"]):
+        elif USERS_PATTERN.search(query_lower):
             metric = 'usuarios'
-        elif any(word in query_lower for word in ["conversion", "conversión"]):
+        elif CONVERSION_PATTERN.search(query_lower):
             metric = 'conversion_rate'
         
-        if any(word in query_lower for word in ["menor", "mínimo", "peor", "lowest", "worst", "mín"]):
+        if ASCENDING_PATTERN.search(query_lower):
             order = 'asc'
         
         # Obtener top performers
         try:
-            return self.query_engine.get_top_performers(
+            return self.top_performers.get_top_performers(
                 metric=metric, 
                 order=order, 
                 limit=5,
@@ -179,56 +492,58 @@ class ABTestingChatbotV2:
             print(f"Error en performance query: {e}")
             return []
     
-    def _build_context(self, query: str, semantic_results: List[Dict], 
-                      filter_results: List[Dict], ab_analysis: Dict, 
+    def _build_context(self, query: str, semantic_results: List[SearchResult], 
+                      filter_results: List[SearchResult], ab_analysis: Dict, 
                       performance_results: List[Dict] = None) -> str:
         """Construye contexto enriquecido para OpenAI"""
         
-        context = f"""
+        parts = [f"""
 CONSULTA DEL USUARIO: {query}
 
 {ab_analysis['summary']}
 
 ANÁLISIS POR SEGMENTOS:
-"""
+"""]
         
         # Análisis regional
         if ab_analysis['regional_analysis']:
-            context += "\n🌍 ANÁLISIS POR REGIÓN:\n"
+            parts.append("\n🌍 ANÁLISIS POR REGIÓN:\n")
             for region, data in ab_analysis['regional_analysis'].items():
-                context += f"• {region}: Lift {data['lift']:+.2f}% (Control: {data['control_conversion_rate']:.2f}% → Experimento: {data['experiment_conversion_rate']:.2f}%)\n"
+                parts.append(f"• {region}: Lift {data['lift']:+.2f}% (Control: {data['control_conversion_rate']:.2f}% → Experimento: {data['experiment_conversion_rate']:.2f}%)\n")
         
         # Análisis por tipo de tienda
         if ab_analysis['store_type_analysis']:
-            context += "\n🏪 ANÁLISIS POR TIPO DE TIENDA:\n"
+            parts.append("\n🏪 ANÁLISIS POR TIPO DE TIENDA:\n")
             for store_type, data in ab_analysis['store_type_analysis'].items():
-                context += f"• {store_type}: Lift {data['lift']:+.2f}% (Control: {data['control_conversion_rate']:.2f}% → Experimento: {data['experiment_conversion_rate']:.2f}%)\n"
+                parts.append(f"• {store_type}: Lift {data['lift']:+.2f}% (Control: {data['control_conversion_rate']:.2f}% → Experimento: {data['experiment_conversion_rate']:.2f}%)\n")
         
         # Resultados de búsqueda semántica
         if semantic_results:
-            context += f"\n🔍 DATOS MÁS RELEVANTES (búsqueda semántica):\n"
-            for i, result in enumerate(semantic_results[:3], 1):
-                context += f"{i}. {result['description']} (Relevancia: {result['score']:.3f})\n"
+            parts.append("\n🔍 DATOS MÁS RELEVANTES (búsqueda semántica):\n")
+            for i, result in enumerate(semantic_results[:CONTEXT_RESULTS], 1):
+                parts.append(f"{i}. {result.description} (Relevancia: {result.score:.3f})\n")
         
         # Resultados de filtros
         if filter_results:
-            context += f"\n📋 DATOS FILTRADOS:\n"
-            for i, result in enumerate(filter_results[:3], 1):
-                context += f"{i}. {result['description']}\n"
+            parts.append("\n📋 DATOS FILTRADOS:\n")
+            for i, result in enumerate(filter_results[:CONTEXT_RESULTS], 1):
+                parts.append(f"{i}. {result.description}\n")
         
         # Resultados de performance (TOP/RANKING)
         if performance_results:
-            context += f"\n🏆 TOP PERFORMERS (ranking por métricas):\n"
+            parts.append("\n🏆 TOP PERFORMERS (ranking por métricas):\n")
             for i, result in enumerate(performance_results, 1):
-                context += f"{i}. Tienda ID: {result.get('tienda_id', 'N/A')} - "
-                context += f"Experimento: {result.get('experimento', 'N/A')} - "
-                context += f"Conversión: {result.get('conversion_rate', 0):.2f}% - "
-                context += f"Revenue: ${result.get('revenue', 0):,.2f} - "
-                context += f"Usuarios: {result.get('usuarios', 0):,}\n"
+                parts.append(
+                    f"{i}. Tienda ID: {result.get('tienda_id', 'N/A')} - "
+                    f"Experimento: {result.get('experimento', 'N/A')} - "
+                    f"Conversión: {result.get('conversion_rate', 0):.2f}% - "
+                    f"Revenue: ${result.get('revenue', 0):,.2f} - "
+                    f"Usuarios: {result.get('usuarios', 0):,}\n"
+                )
         
-        context += f"\nResponde de manera clara y precisa basándote en estos datos."
+        parts.append("\nResponde de manera clara y precisa basándote en estos datos.")
         
-        return context
+        return "".join(parts)
     
     def _get_system_prompt(self) -> str:
         """Obtiene el prompt del sistema"""
@@ -263,7 +578,7 @@ REGLAS:
         print("   • ¿Cómo se comportaron las tiendas Mall vs Street?")
         print("   • ¿Hay diferencias significativas por región?")
         print("   • ¿Qué región tuvo mejor performance?")
-        print("\n📝 Escribe 'salir' para terminar")
+        print("\n📝 Escribe 'salir' para terminar, '/stats' para ver la cache de respuestas")
         print("-"*60)
         
         while True:
@@ -278,9 +593,27 @@ REGLAS:
                     print("⚠️  Por favor, escribe una pregunta.")
                     continue
                 
+                if user_input.lower() == '/stats':
+                    print(f"\n📦 Cache de respuestas: {self._response_cache_hits} aciertos, "
+                          f"{self._response_cache_misses} fallos, "
+                          f"{len(self._response_cache)}/{RESPONSE_CACHE_SIZE} entradas")
+                    continue
+                
                 print("\n🔄 Analizando...")
-                response = self.generate_response(user_input)
-                print(f"\n🤖 Respuesta:\n{response}")
+                print("\n🤖 Respuesta:")
+                streamed = []
+                
+                def print_token(token: str):
+                    streamed.append(token)
+                    sys.stdout.write(token)
+                    sys.stdout.flush()
+                
+                response = self.generate_response(user_input, on_token=print_token)
+                if streamed:
+                    print()
+                else:
+                    # Router, cache o error: la respuesta llega completa sin streaming
+                    print(response)
                 print("\n" + "-"*60)
                 
             except KeyboardInterrupt:
@@ -299,6 +632,8 @@ def main():
         print(f"❌ Error fatal al inicializar chatbot: {str(e)}")
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        ABTestingChatbotV2.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
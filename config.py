@@ -14,8 +14,13 @@ class ABTestingChatbotSettings(BaseSettings):
     # Dataset Configuration
     dataset_path: str = "tiendas_detalle.csv"
     
+    # Directorio de caches persistentes (análisis, índice)
+    cache_dir: str = ".cache"
+    
     # Superlinked Configuration
     embedding_model: str = "all-MiniLM-L6-v2"
+    # Búsqueda sobre vectores cuantizados a int8 (menos memoria, similitudes aproximadas)
+    int8_embeddings: bool = False
     
     # Query Configuration
     default_limit: int = 5
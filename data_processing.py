@@ -1,9 +1,62 @@
 import pandas as pd
+import numpy as np
 import superlinked as sl
+import hashlib
+import importlib.util
+import os
+from functools import cached_property
 from typing import List, Dict
 from schema import ABTestingSchema
 from config import settings
 
+# Columnas del CSV que se indexan en los documentos de Superlinked
+DOCUMENT_COLUMNS = [
+    'experimento', 'tienda_id', 'region', 'tipo_tienda',
+    'usuarios', 'conversiones', 'revenue', 'conversion_rate'
+]
+
+# Tipos fijados al leer el CSV: categorías para las dimensiones y enteros compactos.
+# revenue y conversion_rate se mantienen en float64 para que totales y métricas mostradas
+# conserven la precisión del CSV (los arrays de los tests se reducen a FP32 en analytics)
+CSV_DTYPES = {
+    'experimento': 'category',
+    'tienda_id': 'string',
+    'region': 'category',
+    'tipo_tienda': 'category',
+    'usuarios': 'int32',
+    'conversiones': 'int32',
+    'revenue': 'float64',
+    'conversion_rate': 'float64'
+}
+
+# Parser multihilo de Arrow si pyarrow está instalado; si no, el parser C de pandas
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+# Plantilla única de la descripción textual de cada registro
+DESC_TMPL = (
+    "Experimento {experimento} en tienda {tienda_id}\n"
+    "ubicada en la región {region} de tipo {tipo_tienda}.\n"
+    "Resultados: {usuarios} usuarios visitaron la tienda,\n"
+    "generando {conversiones} conversiones y un revenue de ${revenue:.2f}.\n"
+    "La tasa de conversión fue del {conversion_rate}%.\n"
+    "\n"
+    "Métricas clave:\n"
+    "- Usuarios: {usuarios}\n"
+    "- Conversiones: {conversiones}\n"
+    "- Revenue: ${revenue:.2f}\n"
+    "- Conversion Rate: {conversion_rate}%\n"
+    "- Ubicación: {region} - {tipo_tienda}\n"
+    "- Grupo: {experimento}"
+)
+
+def _create_description(experimento, tienda_id, region, tipo_tienda,
+                        usuarios, conversiones, revenue, conversion_rate) -> str:
+    """Crea una descripción textual rica para un registro"""
+    return DESC_TMPL.format(
+        experimento=experimento, tienda_id=tienda_id, region=region, tipo_tienda=tipo_tienda,
+        usuarios=usuarios, conversiones=conversiones, revenue=revenue, conversion_rate=conversion_rate
+    )
+
 class ABTestingDataProcessor:
     """Procesador de datos para AB Testing"""
     
@@ -14,60 +67,74 @@ class ABTestingDataProcessor:
     
     def load_data(self) -> pd.DataFrame:
         """Carga los datos del CSV"""
-        return pd.read_csv(self.csv_path)
+        # Una recarga invalida los valores derivados del CSV
+        self.__dict__.pop('data_summary', None)
+        self.__dict__.pop('csv_fingerprint', None)
+        return pd.read_csv(self.csv_path, usecols=DOCUMENT_COLUMNS, dtype=CSV_DTYPES, engine=CSV_ENGINE)
+    
+    @cached_property
+    def csv_fingerprint(self) -> str:
+        """Huella del CSV (mtime + hash del contenido) para claves de caches persistentes"""
+        digest = hashlib.sha256()
+        with open(self.csv_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return f"{os.stat(self.csv_path).st_mtime_ns}_{digest.hexdigest()[:16]}"
     
     def prepare_documents(self) -> List[Dict]:
         """Prepara los documentos para indexar en Superlinked"""
-        documents = []
+        df = self.data
         
-        for idx, row in self.data.iterrows():
-            # Crear descripción rica para búsqueda semántica
-            description = self._create_description(row)
-            
-            document = {
-                'id': f"{row['experimento']}_{row['tienda_id']}_{idx}",
-                'experimento': row['experimento'],
-                'tienda_id': row['tienda_id'],
-                'region': row['region'],
-                'tipo_tienda': row['tipo_tienda'],
-                'usuarios': int(row['usuarios']),
-                'conversiones': int(row['conversiones']),
-                'revenue': float(row['revenue']),
-                'conversion_rate': float(row['conversion_rate']),
-                'description': description
-            }
-            documents.append(document)
+        # Ids y descripciones construidos columna a columna (sin iterrows)
+        ids = df['experimento'].astype(str) + '_' + df['tienda_id'].astype(str) + '_' + df.index.astype(str)
+        descriptions = self._create_descriptions(df)
+        
+        # Los tipos ya vienen fijados desde load_data: to_dict devuelve str/int/float nativos
+        documents = df[DOCUMENT_COLUMNS].assign(
+            id=ids,
+            description=descriptions
+        ).to_dict(orient='records')
         
         return documents
     
-    def _create_description(self, row) -> str:
-        """Crea una descripción textual rica para cada registro"""
-        description = f"""
-        Experimento {row['experimento']} en tienda {row['tienda_id']} 
-        ubicada en la región {row['region']} de tipo {row['tipo_tienda']}.
-        Resultados: {row['usuarios']} usuarios visitaron la tienda, 
-        generando {row['conversiones']} conversiones y un revenue de ${row['revenue']:.2f}.
-        La tasa de conversión fue del {row['conversion_rate']}%.
+    def _create_descriptions(self, df: pd.DataFrame) -> List[str]:
+        """Crea las descripciones textuales de todos los registros"""
+        # Columnas numéricas redondeadas en bloque con numpy; .tolist() entrega
+        # escalares nativos sin construir un dict por fila
+        revenue = np.round(df['revenue'].to_numpy(dtype=np.float64), 2).tolist()
+        conversion_rate = np.round(df['conversion_rate'].to_numpy(dtype=np.float64), 3).tolist()
         
-        Métricas clave:
-        - Usuarios: {row['usuarios']}
-        - Conversiones: {row['conversiones']} 
-        - Revenue: ${row['revenue']:.2f}
-        - Conversion Rate: {row['conversion_rate']}%
-        - Ubicación: {row['region']} - {row['tipo_tienda']}
-        - Grupo: {row['experimento']}
-        """
-        return description.strip()
+        return [
+            _create_description(*values)
+            for values in zip(
+                df['experimento'].tolist(), df['tienda_id'].tolist(),
+                df['region'].tolist(), df['tipo_tienda'].tolist(),
+                df['usuarios'].tolist(), df['conversiones'].tolist(),
+                revenue, conversion_rate
+            )
+        ]
     
-    def get_data_summary(self) -> Dict:
-        """Obtiene resumen estadístico de los datos"""
+    @cached_property
+    def data_summary(self) -> Dict:
+        """Resumen estadístico de los datos (se calcula una vez por carga)"""
+        # Una sola agregación sobre el DataFrame para todas las métricas
+        totals = self.data.agg({
+            'usuarios': 'sum',
+            'conversiones': 'sum',
+            'revenue': 'sum',
+            'conversion_rate': 'mean'
+        })
         return {
             'total_records': len(self.data),
             'experiments': self.data['experimento'].unique().tolist(),
             'regions': self.data['region'].unique().tolist(),
             'store_types': self.data['tipo_tienda'].unique().tolist(),
-            'total_users': self.data['usuarios'].sum(),
-            'total_conversions': self.data['conversiones'].sum(),
-            'total_revenue': self.data['revenue'].sum(),
-            'avg_conversion_rate': self.data['conversion_rate'].mean()
-        }
\ No newline at end of file
+            'total_users': int(totals['usuarios']),
+            'total_conversions': int(totals['conversiones']),
+            'total_revenue': float(totals['revenue']),
+            'avg_conversion_rate': float(totals['conversion_rate'])
+        }
+    
+    def get_data_summary(self) -> Dict:
+        """Obtiene resumen estadístico de los datos"""
+        return self.data_summary
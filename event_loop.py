@@ -0,0 +1,28 @@
+"""
+Event loop compartido para los clientes async de OpenAI
+Corre en un único hilo daemon dedicado; los demás hilos le envían corrutinas con run_coroutine
+"""
+
+import asyncio
+import threading
+from typing import Optional
+
+_EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_EVENT_LOOP_LOCK = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Event loop persistente donde viven los clientes async (sus conexiones quedan ligadas a él)
+    
+    Los demás hilos no lo ejecutan ellos mismos: run_until_complete no es reentrante y falla
+    si dos hilos lo llaman a la vez o si ya hay un loop en marcha.
+    """
+    global _EVENT_LOOP
+    with _EVENT_LOOP_LOCK:
+        if _EVENT_LOOP is None or _EVENT_LOOP.is_closed():
+            _EVENT_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_EVENT_LOOP.run_forever, name="chatbot-event-loop", daemon=True).start()
+    return _EVENT_LOOP
+
+def run_coroutine(coro):
+    """Ejecuta una corrutina en el event loop compartido y espera su resultado (desde cualquier hilo)"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
@@ -4,88 +4,64 @@ from superlinked.framework.dsl.space.text_similarity_space import TextSimilarity
 from superlinked.framework.dsl.index.index import Index
 from schema import ABTestingSchema
 from config import settings
+import hashlib
+import json
 
-def create_ab_testing_index():
-    """Crea el índice de Superlinked para datos de AB Testing"""
-    
-    schema = ABTestingSchema()
-    
-    # Definir espacios vectoriales con pesos configurables
-    experimento_space = CategoricalSimilaritySpace(
-        schema.experimento,
-        categories=["Control", "Experimento_A"],
-        negative_filter=0.8
-    )
-    
-    region_space = CategoricalSimilaritySpace(
-        schema.region,
-        categories=["Este", "Norte", "Sur", "Oeste"],
-        negative_filter=0.7
-    )
-    
-    tipo_tienda_space = CategoricalSimilaritySpace(
-        schema.tipo_tienda,
-        categories=["Mall", "Street", "Outlet"], 
-        negative_filter=0.7
-    )
-    
-    # Espacios numéricos para métricas
-    usuarios_space = NumberSpace(
-        schema.usuarios,
-        min_value=0,
-        max_value=500,
-        mode=Mode.SIMILAR
-    )
+# Definición de los espacios vectoriales, en el orden en que entran al índice.
+# También forma parte de la clave del índice persistido (ver index_config_fingerprint)
+CATEGORICAL_SPACES = {
+    'experimento': {'categories': ["Control", "Experimento_A"], 'negative_filter': 0.8},
+    'region': {'categories': ["Este", "Norte", "Sur", "Oeste"], 'negative_filter': 0.7},
+    'tipo_tienda': {'categories': ["Mall", "Street", "Outlet"], 'negative_filter': 0.7},
+}
+
+# Espacios numéricos para métricas (todos en modo SIMILAR)
+NUMBER_SPACES = {
+    'usuarios': {'min_value': 0, 'max_value': 500},
+    'conversiones': {'min_value': 0, 'max_value': 50},
+    'revenue': {'min_value': 0, 'max_value': 1000},
+    'conversion_rate': {'min_value': 0, 'max_value': 20},
+}
+
+def index_config_fingerprint() -> str:
+    """Huella de la configuración del índice: espacios, modelo de embeddings y pesos"""
+    config = {
+        'categorical': CATEGORICAL_SPACES,
+        'number': {name: {**params, 'mode': Mode.SIMILAR.value} for name, params in NUMBER_SPACES.items()},
+        'embedding_model': settings.embedding_model,
+        'weights': {
+            name: value for name, value in settings.model_dump().items()
+            if name.endswith('_space_weight')
+        },
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+def create_ab_testing_index(schema: ABTestingSchema = None):
+    """Crea el índice de Superlinked para datos de AB Testing
     
-    conversiones_space = NumberSpace(
-        schema.conversiones,
-        min_value=0,
-        max_value=50,
-        mode=Mode.SIMILAR
-    )
+    Acepta un schema ya construido (p. ej. el del procesador de datos) para no instanciarlo dos veces.
+    """
     
-    revenue_space = NumberSpace(
-        schema.revenue,
-        min_value=0,
-        max_value=1000,
-        mode=Mode.SIMILAR
-    )
+    if schema is None:
+        schema = ABTestingSchema()
     
-    conversion_rate_space = NumberSpace(
-        schema.conversion_rate,
-        min_value=0,
-        max_value=20,
-        mode=Mode.SIMILAR
-    )
+    # Definir espacios vectoriales con pesos configurables
+    spaces = {
+        name: CategoricalSimilaritySpace(getattr(schema, name), **params)
+        for name, params in CATEGORICAL_SPACES.items()
+    }
+    spaces.update({
+        name: NumberSpace(getattr(schema, name), mode=Mode.SIMILAR, **params)
+        for name, params in NUMBER_SPACES.items()
+    })
     
     # Espacio de texto para descripciones
-    description_space = TextSimilaritySpace(
+    spaces['description'] = TextSimilaritySpace(
         schema.description,
         model=settings.embedding_model
     )
     
     # Crear índice con todos los espacios vectoriales
-    index = Index([
-        experimento_space,
-        region_space,
-        tipo_tienda_space,
-        usuarios_space,
-        conversiones_space,
-        revenue_space,
-        conversion_rate_space,
-        description_space
-    ])
-    
-    # Crear diccionario de espacios para facilitar el acceso
-    spaces = {
-        'experimento': experimento_space,
-        'region': region_space,
-        'tipo_tienda': tipo_tienda_space,
-        'usuarios': usuarios_space,
-        'conversiones': conversiones_space,
-        'revenue': revenue_space,
-        'conversion_rate': conversion_rate_space,
-        'description': description_space
-    }
+    index = Index(list(spaces.values()))
     
-    return index, schema, spaces
\ No newline at end of file
+    return index, schema, spaces
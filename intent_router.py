@@ -4,10 +4,56 @@ Evita cascadas de if/else y facilita el mantenimiento
 """
 
 import re
+import importlib.util
+import numpy as np
+import pandas as pd
 from typing import Dict, List, Optional, Callable, Any
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    import re2  # google-re2 (opcional): autómata sin backtracking, API compatible con re
+except ImportError:
+    re2 = None
+
+# Dtype de las consultas en classify_many: con pyarrow las regex se evalúan en bloque (RE2, en C++)
+BATCH_STRING_DTYPE = 'string[pyarrow]' if importlib.util.find_spec('pyarrow') else object
+
+# ID de tienda dentro de una consulta (p. ej. T_Control_001)
+STORE_ID_PATTERN = re.compile(r"T_(Control|Experimento_[ABC])_\d{3}")
+
+# Palabra clave -> experimento; el orden fija la precedencia (Control antes que las variantes)
+EXPERIMENT_KEYWORDS = {
+    "control": "Control",
+    "experimento a": "Experimento_A",
+    "experimento_a": "Experimento_A",
+    "experiment a": "Experimento_A",
+    "experimento b": "Experimento_B",
+    "experimento_b": "Experimento_B",
+    "experiment b": "Experimento_B",
+    "experimento c": "Experimento_C",
+    "experimento_c": "Experimento_C",
+    "experiment c": "Experimento_C",
+}
+
+# Sujeto usado en las respuestas de cada experimento
+EXPERIMENT_LABELS = {
+    "Control": "El grupo Control",
+    "Experimento_A": "El Experimento A",
+    "Experimento_B": "El Experimento B",
+    "Experimento_C": "El Experimento C",
+}
+
+def _detect_experiment(query_lower: str) -> Optional[str]:
+    """Experimento mencionado en la consulta (None si no se menciona ninguno)"""
+    for keyword, experiment in EXPERIMENT_KEYWORDS.items():
+        if keyword in query_lower:
+            return experiment
+    return None
+
+# Agregados de un experimento sin filas en el dataset
+EMPTY_EXPERIMENT_STATS = {'usuarios': 0, 'conversiones': 0, 'stores': 0}
+
 class IntentType(Enum):
     """Tipos de intents del chatbot"""
     GREETING = "greeting"
@@ -31,7 +77,75 @@ class IntentRouter:
     def __init__(self, data_processor, settings):
         self.data_processor = data_processor
         self.settings = settings
+        # Resumen y agregados por experimento reutilizados entre mensajes mientras el DataFrame no cambie
+        self._summary_cache = None
+        self._exp_stats = None
+        self._store_index = None
+        self._data_token = None
         self._define_intents()
+        self._combined_pattern = self._build_combined_pattern()
+        self._unknown_intent = Intent(
+            type=IntentType.UNKNOWN,
+            patterns=[],
+            keywords=[],
+            handler="handle_unknown",
+            priority=0
+        )
+        self._batch_patterns = self._build_batch_patterns()
+        # Tipo de intent -> método handler, resuelto una vez en vez de un getattr por consulta
+        self._handlers = {
+            intent.type: getattr(self, intent.handler)
+            for intent in [*self.intents, self._unknown_intent]
+        }
+    
+    def _build_combined_pattern(self):
+        """Fusiona patrones y keywords de todos los intents en una sola alternancia con nombre
+        
+        Orden de las alternativas = orden de evaluación original: primero los patrones de cada
+        intent (por prioridad), luego sus keywords. Cada alternativa empieza con `(?s:.*?)` (que
+        también cruza saltos de línea, como `re.search`) y se usa `match`, así que la primera
+        alternativa que encaja en cualquier posición gana, igual que el recorrido intent por intent.
+        La consulta llega en minúsculas, así que los patrones se escriben en minúsculas y sin
+        IGNORECASE; las keywords se comparan literalmente, como `keyword in query_lower`.
+        
+        Con google-re2 instalado el patrón se compila a un autómata sin backtracking;
+        si no está (o RE2 no admite alguna construcción) se usa `re`.
+        """
+        alternatives = []
+        for position, intent in enumerate(self.intents):
+            for pattern in intent.patterns:
+                alternatives.append((position, pattern))
+        for position, intent in enumerate(self.intents):
+            if intent.keywords:
+                alternatives.append((position, "|".join(map(re.escape, intent.keywords))))
+        
+        combined = "|".join(
+            f"(?P<g{position}_{number}>(?s:.*?)(?:{alternative}))"
+            for number, (position, alternative) in enumerate(alternatives)
+        )
+        
+        if re2 is not None:
+            try:
+                return re2.compile(combined)
+            except re2.error:
+                pass
+        return re.compile(combined)
+    
+    def _build_batch_patterns(self) -> List[Optional[str]]:
+        """Una regex por intent para sus patrones y otra para sus keywords (None si no tiene)
+        
+        Orden: patrones de todos los intents (por prioridad) y después sus keywords, el mismo
+        orden de evaluación que el patrón combinado de classify_intent.
+        """
+        pattern_columns = [
+            "|".join(f"(?:{pattern})" for pattern in intent.patterns) or None
+            for intent in self.intents
+        ]
+        keyword_columns = [
+            "|".join(map(re.escape, intent.keywords)) or None
+            for intent in self.intents
+        ]
+        return pattern_columns + keyword_columns
     
     def _define_intents(self):
         """Define todos los intents disponibles"""
@@ -39,7 +153,7 @@ class IntentRouter:
             # SALUDOS - Prioridad alta
             Intent(
                 type=IntentType.GREETING,
-                patterns=[r"^(hola|hello|hi|buenos días|buenas tardes)[\s\.\!]*$"],
+                patterns=[r"^(?:hola|hello|hi|buenos días|buenas tardes)[\s\.\!]*$"],
                 keywords=["hola", "hello", "hi", "buenos días", "buenas tardes"],
                 handler="handle_greeting",
                 priority=3
@@ -49,8 +163,8 @@ class IntentRouter:
             Intent(
                 type=IntentType.COUNT_QUERY,
                 patterns=[
-                    r".*(cuántos|cuántas|cantidad|número|total).*",
-                    r".*(how many|count of).*"
+                    r"(?:cuántos|cuántas|cantidad|número|total)",
+                    r"(?:how many|count of)"
                 ],
                 keywords=["cuántos", "cuántas", "cantidad", "número", "total", "how many", "count"],
                 handler="handle_count_query",
@@ -61,8 +175,8 @@ class IntentRouter:
             Intent(
                 type=IntentType.DATA_INFO,
                 patterns=[
-                    r".*(qué datos|qué información|datos disponibles).*",
-                    r".*(what data|available data).*"
+                    r"(?:qué datos|qué información|datos disponibles)",
+                    r"(?:what data|available data)"
                 ],
                 keywords=["qué datos", "qué información", "datos", "información", "tenemos", "disponibles"],
                 handler="handle_data_info",
@@ -73,62 +187,102 @@ class IntentRouter:
             Intent(
                 type=IntentType.STORE_ID_QUERY,
                 patterns=[
-                    r".*T_(Control|Experimento_[ABC])_\d{3}.*",
-                    r".*(tienda|store).*id.*",
-                    r".*datos.*de.*T_.*"
+                    r"t_(?:control|experimento_[abc])_\d{3}",
+                    r"(?:tienda|store).*id",
+                    r"datos.*de.*t_"
                 ],
                 keywords=["T_Control", "T_Experimento", "tienda id", "store id"],
                 handler="handle_store_id_query",
                 priority=3
             ),
         ]
+        
+        # Orden de evaluación fijo (mayor prioridad primero; estable ante empates):
+        # se ordena una vez al definir los intents y no en cada consulta
+        self.intents.sort(key=lambda x: x.priority, reverse=True)
     
-    def classify_intent(self, query: str) -> Intent:
-        """Clasifica una consulta y retorna el intent correspondiente"""
-        query_lower = query.lower().strip()
+    def classify_intent(self, query: str, query_lower: Optional[str] = None) -> Intent:
+        """Clasifica una consulta y retorna el intent correspondiente
         
-        # Buscar por patrones primero (más específico)
-        for intent in sorted(self.intents, key=lambda x: x.priority, reverse=True):
-            for pattern in intent.patterns:
-                if re.search(pattern, query_lower, re.IGNORECASE):
-                    return intent
+        `query_lower` permite reutilizar la consulta ya normalizada (minúsculas, sin espacios extremos).
+        """
+        if query_lower is None:
+            query_lower = query.lower().strip()
         
-        # Luego por keywords
-        for intent in sorted(self.intents, key=lambda x: x.priority, reverse=True):
-            if any(keyword in query_lower for keyword in intent.keywords):
-                return intent
+        # Una sola evaluación del patrón combinado; el grupo que encaja identifica el intent
+        match = self._combined_pattern.match(query_lower)
+        if match:
+            return self.intents[int(match.lastgroup[1:].split('_')[0])]
         
         # Intent desconocido
-        return Intent(
-            type=IntentType.UNKNOWN,
-            patterns=[],
-            keywords=[],
-            handler="handle_unknown",
-            priority=0
-        )
+        return self._unknown_intent
+    
+    def classify_many(self, queries: List[str]) -> List[Intent]:
+        """Clasifica un lote de consultas (evaluación offline, replay de logs) con operaciones vectorizadas
+        
+        Devuelve lo mismo que llamar a classify_intent con cada consulta: se construye una matriz
+        booleana consultas x columnas (ver _build_batch_patterns) y gana la primera columna que encaja.
+        """
+        series = pd.Series(queries, dtype=BATCH_STRING_DTYPE).str.lower().str.strip()
+        matches = np.column_stack([
+            series.str.contains(pattern, regex=True).to_numpy(dtype=bool, na_value=False)
+            if pattern is not None else np.zeros(len(series), dtype=bool)
+            for pattern in self._batch_patterns
+        ])
+        
+        winners = matches.argmax(axis=1) % len(self.intents)
+        return [
+            self.intents[winner] if matched else self._unknown_intent
+            for winner, matched in zip(winners.tolist(), matches.any(axis=1).tolist())
+        ]
+    
+    def _sync_data_cache(self):
+        """Recalcula resumen y agregados por experimento solo si el DataFrame del procesador cambia"""
+        data = self.data_processor.data
+        if id(data) != self._data_token:
+            self._summary_cache = self.data_processor.get_data_summary()
+            # Un único groupby sustituye las máscaras + sumas por experimento de cada handler
+            self._exp_stats = data.groupby('experimento', observed=True).agg(
+                usuarios=('usuarios', 'sum'),
+                conversiones=('conversiones', 'sum'),
+                stores=('tienda_id', 'size')
+            ).to_dict(orient='index')
+            # tienda_id -> fila (primera aparición): búsqueda por hash en vez de filtrar la columna
+            self._store_index = data.drop_duplicates('tienda_id').set_index('tienda_id').to_dict(orient='index')
+            self._data_token = id(data)
+    
+    def _summary(self) -> Dict:
+        """Resumen de los datos"""
+        self._sync_data_cache()
+        return self._summary_cache
+    
+    def _experiment_stats(self, experiment: str) -> Dict:
+        """Usuarios, conversiones y número de tiendas de un experimento (ceros si no tiene filas)"""
+        self._sync_data_cache()
+        return self._exp_stats.get(experiment, EMPTY_EXPERIMENT_STATS)
     
     def route_query(self, query: str) -> Optional[str]:
         """Enruta una consulta al handler apropiado"""
-        intent = self.classify_intent(query)
+        # La consulta se normaliza una sola vez y se comparte con el handler
+        query_lower = query.lower().strip()
+        intent = self.classify_intent(query, query_lower)
         
-        # Obtener el handler method
-        handler_method = getattr(self, intent.handler, None)
+        handler_method = self._handlers.get(intent.type)
         if handler_method:
-            return handler_method(query, intent)
+            return handler_method(query, query_lower, intent)
         
         return None
     
-    def handle_greeting(self, query: str, intent: Intent) -> str:
+    def handle_greeting(self, query: str, query_lower: str, intent: Intent) -> str:
         """Handler para saludos"""
         # Solo saludos cortos y simples
         if len(query.strip()) <= 15:
             return "¡Hola! Estoy aquí para ayudarte con el análisis de AB Testing. ¿Qué te gustaría saber sobre los datos?"
         return None  # Saludo complejo, pasarlo a OpenAI
     
-    def handle_count_query(self, query: str, intent: Intent) -> str:
+    def handle_count_query(self, query: str, query_lower: str, intent: Intent) -> str:
         """Handler para consultas de cantidad/conteo"""
-        query_lower = query.lower()
-        summary = self.data_processor.get_data_summary()
+        summary = self._summary()
         
         # Consultas combinadas (tiendas Y usuarios)
         if ("tienda" in query_lower or "store" in query_lower) and ("usuario" in query_lower or "user" in query_lower):
@@ -151,9 +305,9 @@ class IntentRouter:
         # Conteo genérico
         return f"El dataset contiene {summary['total_records']} tiendas con {summary['total_users']:,} usuarios y {summary['total_conversions']:,} conversiones en total."
     
-    def handle_data_info(self, query: str, intent: Intent) -> str:
+    def handle_data_info(self, query: str, query_lower: str, intent: Intent) -> str:
         """Handler para información sobre los datos"""
-        summary = self.data_processor.get_data_summary()
+        summary = self._summary()
         return f"""Datos disponibles en el dataset:
 • {summary['total_records']} registros de tiendas
 • Experimentos: {', '.join(summary['experiments'])} 
@@ -163,22 +317,19 @@ class IntentRouter:
 • Total conversiones: {summary['total_conversions']:,}
 • Revenue total: ${summary['total_revenue']:,.2f}"""
     
-    def handle_store_id_query(self, query: str, intent: Intent) -> str:
+    def handle_store_id_query(self, query: str, query_lower: str, intent: Intent) -> str:
         """Handler para consultas específicas por ID de tienda"""
-        import re
-        
         # Extraer ID de tienda de la consulta
-        store_id_pattern = r"T_(Control|Experimento_[ABC])_\d{3}"
-        match = re.search(store_id_pattern, query)
+        match = STORE_ID_PATTERN.search(query)
         
         if match:
             store_id = match.group(0)
             
             # Buscar en los datos
-            store_data = self.data_processor.data[self.data_processor.data['tienda_id'] == store_id]
+            self._sync_data_cache()
+            row = self._store_index.get(store_id)
             
-            if not store_data.empty:
-                row = store_data.iloc[0]
+            if row is not None:
                 return f"""Datos de la tienda {store_id}:
 • Experimento: {row['experimento']}
 • Región: {row['region']}
@@ -192,33 +343,26 @@ class IntentRouter:
         
         return None  # No se encontró ID válido, delegar a OpenAI
     
-    def handle_unknown(self, query: str, intent: Intent) -> None:
+    def handle_unknown(self, query: str, query_lower: str, intent: Intent) -> None:
         """Handler para intents desconocidos - delegar a OpenAI"""
         return None
     
     # Handlers específicos para conteos
     def _count_users(self, query_lower: str, summary: Dict) -> str:
         """Contador específico de usuarios"""
-        if "control" in query_lower:
-            control_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Control']
-            total_users_control = control_data['usuarios'].sum()
+        experiment = _detect_experiment(query_lower)
+        
+        if experiment == 'Control':
+            total_users_control = self._experiment_stats('Control')['usuarios']
             return f"Las tiendas del grupo Control tienen un total de {total_users_control:,} usuarios."
         
-        elif any(exp in query_lower for exp in ["experimento a", "experimento_a", "experiment a"]):
-            exp_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Experimento_A']
-            users = exp_data['usuarios'].sum()
-            stores = len(exp_data)
-            return f"El Experimento A tiene {stores} tiendas con un total de {users:,} usuarios."
+        elif experiment:
+            return self._count_stores_and_users(query_lower, summary)
         
         elif any(exp in query_lower for exp in ["experimento", "experiment", "variante"]):
-            exp_users = {}
-            for exp in ['Experimento_A', 'Experimento_B', 'Experimento_C']:
-                exp_data = self.data_processor.data[self.data_processor.data['experimento'] == exp]
-                exp_users[exp] = exp_data['usuarios'].sum()
-            
             response = "Total de usuarios por experimento:\n"
-            for exp, users in exp_users.items():
-                response += f"• {exp}: {users:,} usuarios\n"
+            for exp in ['Experimento_A', 'Experimento_B', 'Experimento_C']:
+                response += f"• {exp}: {self._experiment_stats(exp)['usuarios']:,} usuarios\n"
             return response.strip()
         
         else:
@@ -226,27 +370,35 @@ class IntentRouter:
     
     def _count_conversions(self, query_lower: str, summary: Dict) -> str:
         """Contador específico de conversiones"""
-        if "control" in query_lower:
-            control_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Control']
-            total_conversions = control_data['conversiones'].sum()
-            return f"El grupo Control tiene un total de {total_conversions:,} conversiones."
+        experiment = _detect_experiment(query_lower)
+        
+        if experiment:
+            total_conversions = self._experiment_stats(experiment)['conversiones']
+            return f"{EXPERIMENT_LABELS[experiment]} tiene un total de {total_conversions:,} conversiones."
         else:
             return f"En total hay {summary['total_conversions']:,} conversiones en todo el dataset."
     
     def _count_stores(self, query_lower: str, summary: Dict) -> str:
         """Contador específico de tiendas/registros"""
-        if "control" in query_lower:
-            control_count = len(self.data_processor.data[self.data_processor.data['experimento'] == 'Control'])
+        experiment = _detect_experiment(query_lower)
+        
+        if experiment == 'Control':
+            control_count = self._experiment_stats('Control')['stores']
             return f"Hay {control_count} tiendas en el grupo Control."
         
-        elif any(exp in query_lower for exp in ["experimento a", "experimento_a", "experiment a"]):
-            exp_count = len(self.data_processor.data[self.data_processor.data['experimento'] == 'Experimento_A'])
-            return f"El Experimento A tiene {exp_count} tiendas."
+        elif experiment:
+            exp_count = self._experiment_stats(experiment)['stores']
+            return f"{EXPERIMENT_LABELS[experiment]} tiene {exp_count} tiendas."
         
         elif "experimento" in query_lower:
-            exp_counts = self.data_processor.data[self.data_processor.data['experimento'] != 'Control']['experimento'].value_counts()
+            self._sync_data_cache()
+            exp_counts = sorted(
+                ((exp, stats['stores']) for exp, stats in self._exp_stats.items() if exp != 'Control'),
+                key=lambda item: item[1],
+                reverse=True
+            )
             response = "Cantidad de tiendas por experimento:\n"
-            for exp, count in exp_counts.items():
+            for exp, count in exp_counts:
                 response += f"• {exp}: {count} tiendas\n"
             return response.strip()
         
@@ -263,29 +415,11 @@ class IntentRouter:
     
     def _count_stores_and_users(self, query_lower: str, summary: Dict) -> str:
         """Contador combinado de tiendas y usuarios"""
-        if "control" in query_lower:
-            control_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Control']
-            stores = len(control_data)
-            users = control_data['usuarios'].sum()
-            return f"El grupo Control tiene {stores} tiendas con un total de {users:,} usuarios."
-        
-        elif any(exp in query_lower for exp in ["experimento a", "experimento_a", "experiment a"]):
-            exp_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Experimento_A']
-            stores = len(exp_data)
-            users = exp_data['usuarios'].sum()
-            return f"El Experimento A tiene {stores} tiendas con un total de {users:,} usuarios."
-        
-        elif any(exp in query_lower for exp in ["experimento b", "experimento_b", "experiment b"]):
-            exp_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Experimento_B']
-            stores = len(exp_data)
-            users = exp_data['usuarios'].sum()
-            return f"El Experimento B tiene {stores} tiendas con un total de {users:,} usuarios."
+        experiment = _detect_experiment(query_lower)
         
-        elif any(exp in query_lower for exp in ["experimento c", "experimento_c", "experiment c"]):
-            exp_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Experimento_C']
-            stores = len(exp_data)
-            users = exp_data['usuarios'].sum()
-            return f"El Experimento C tiene {stores} tiendas con un total de {users:,} usuarios."
+        if experiment:
+            stats = self._experiment_stats(experiment)
+            return f"{EXPERIMENT_LABELS[experiment]} tiene {stats['stores']} tiendas con un total de {stats['usuarios']:,} usuarios."
         
         else:
-            return f"El dataset contiene {summary['total_records']} tiendas con {summary['total_users']:,} usuarios en total."
\ No newline at end of file
+            return f"El dataset contiene {summary['total_records']} tiendas con {summary['total_users']:,} usuarios en total."
@@ -1,22 +1,331 @@
 from superlinked.framework.dsl.query.query import Query
-from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import numpy as np
+import pandas as pd
+import re
+import threading
+import warnings
 from config import settings
+from data_processing import ABTestingDataProcessor
+
+# Letras que forman palabra en una consulta (minúsculas, con acentos)
+WORD_CHARS = "a-záéíóúüñ"
+
+# A partir de este número de filas los ids y descripciones se construyen en bloque con pandas/numpy
+VECTORIZED_MIN_ROWS = 256
+
+# Palabra clave -> valor del filtro, en orden de prioridad (gana la primera coincidencia)
+EXPERIMENT_KEYWORDS = {
+    'control': 'Control',
+    'experimento': 'Experimento_A',
+    'experimentos': 'Experimento_A',
+    'variante': 'Experimento_A',
+    'variantes': 'Experimento_A',
+}
+
+REGION_KEYWORDS = {
+    'este': 'Este',
+    'norte': 'Norte',
+    'sur': 'Sur',
+    'oeste': 'Oeste',
+}
+
+STORE_TYPE_KEYWORDS = {
+    'mall': 'Mall',
+    'malls': 'Mall',
+    'street': 'Street',
+    'calle': 'Street',
+    'calles': 'Street',
+    'outlet': 'Outlet',
+    'outlets': 'Outlet',
+}
+
+FILTER_KEYWORDS = {
+    'experimento': EXPERIMENT_KEYWORDS,
+    'region': REGION_KEYWORDS,
+    'tipo_tienda': STORE_TYPE_KEYWORDS,
+}
+
+def _keyword_pattern(keywords) -> re.Pattern:
+    """Alternación precompilada que sólo coincide con palabras completas de `keywords`"""
+    alternatives = '|'.join(sorted(map(re.escape, keywords), key=len, reverse=True))
+    return re.compile(rf"(?<![{WORD_CHARS}])(?:{alternatives})(?![{WORD_CHARS}])")
+
+# Palabra clave -> (campo, valor, prioridad dentro del campo; menor = gana)
+KEYWORD_FILTERS = {
+    keyword: (field_name, value, rank)
+    for field_name, keywords in FILTER_KEYWORDS.items()
+    for rank, (keyword, value) in enumerate(keywords.items())
+}
+
+# Todas las palabras clave de todos los campos en una sola alternación
+FILTER_KEYWORD_PATTERN = _keyword_pattern(KEYWORD_FILTERS)
+
+# Tipos nativos de las métricas en los resultados de get_top_performers
+TOP_PERFORMER_METRIC_DTYPES = {
+    'usuarios': 'int64',
+    'conversiones': 'int64',
+    'revenue': 'float64',
+    'conversion_rate': 'float64',
+}
+
+# Campos de ABTestingSchema sobre los que _apply_filters puede filtrar
+SCHEMA_FIELDS = (
+    'experimento', 'tienda_id', 'region', 'tipo_tienda',
+    'usuarios', 'conversiones', 'revenue', 'conversion_rate', 'description',
+)
+
+# Columnas de cada resultado de get_top_performers, en el orden en que se desempaquetan
+TOP_PERFORMER_COLUMNS = (
+    'tienda_id', 'experimento', 'region', 'tipo_tienda',
+    'usuarios', 'conversiones', 'revenue', 'conversion_rate',
+)
+
+# Campos que el resultado de Superlinked no trae: plantilla compartida por todas las filas
+UNAVAILABLE_RESULT_DATA = {
+    'region': 'Unknown',
+    'tipo_tienda': 'Unknown',
+    'usuarios': 0,
+    'conversiones': 0,
+    'revenue': 0.0,
+    'conversion_rate': 0.0,
+}
+
+@lru_cache(maxsize=512)
+def _extract_filters(query_lower: str) -> Tuple[Tuple[str, str], ...]:
+    """Pares (campo, valor) de los filtros mencionados en una consulta ya en minúsculas"""
+    # Un único escaneo de la consulta; por campo gana la coincidencia de mayor prioridad
+    best_matches = {}
+    for keyword in FILTER_KEYWORD_PATTERN.findall(query_lower):
+        field_name, value, rank = KEYWORD_FILTERS[keyword]
+        if field_name not in best_matches or rank < best_matches[field_name][1]:
+            best_matches[field_name] = (value, rank)
+    
+    return tuple(
+        (field_name, best_matches[field_name][0])
+        for field_name in FILTER_KEYWORDS if field_name in best_matches
+    )
+
+def extract_filters_from_query(query: str) -> Dict:
+    """Extrae filtros potenciales de la consulta del usuario (no necesita índice ni modelo)"""
+    # Las consultas repetidas (misma forma en minúsculas) reutilizan el resultado cacheado
+    return dict(_extract_filters(query.lower()))
+
+def _parse_result_id(result_id: str):
+    """Extrae (experimento, tienda_id) del id de un resultado con formato experimento_tienda_idx"""
+    id_parts = result_id.split('_', 3)
+    if len(id_parts) < 3:
+        return 'Unknown', 'Unknown'
+    # El tienda_id parece estar en el formato T_experimento_numero
+    tienda_id = f"{id_parts[1]}_{id_parts[2]}" if len(id_parts) > 3 else id_parts[1]
+    return id_parts[0], tienda_id
+
+def _parse_result_ids(result_ids: List[str]):
+    """Versión vectorizada de _parse_result_id: un único str.split sobre todos los ids"""
+    parts = pd.Series(result_ids, dtype=object).str.split('_', n=3, expand=True).reindex(columns=range(4))
+    has_store = parts[2].notna()
+    tienda_ids = (parts[1] + '_' + parts[2]).where(parts[3].notna(), parts[1])
+    return (
+        parts[0].where(has_store, 'Unknown').tolist(),
+        tienda_ids.where(has_store, 'Unknown').tolist(),
+    )
+
+def _column_equals(column: pd.Series, value) -> np.ndarray:
+    """Máscara booleana column == value; en columnas categóricas compara los códigos enteros"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        code = column.cat.categories.get_indexer([value])[0]
+        if code < 0:
+            return np.zeros(len(column), dtype=bool)
+        return column.cat.codes.to_numpy() == code
+    return (column == value).to_numpy(dtype=bool, na_value=False)
+
+def _ranked_positions(values: np.ndarray, descending: bool) -> np.ndarray:
+    """Todas las posiciones ordenadas por valor, como nlargest/nsmallest con keep='first'
+    
+    Los empates se resuelven por posición y los NaN quedan al final en su orden original, así que
+    los K primeros de cualquier subconjunto de filas son exactamente su nlargest/nsmallest(K).
+    """
+    keys = np.asarray(values, dtype=np.float64)
+    if descending:
+        keys = -keys
+    missing = np.isnan(keys)
+    candidates = np.flatnonzero(~missing)
+    ordered = candidates[np.argsort(keys[candidates], kind='stable')]
+    return np.concatenate([ordered, np.flatnonzero(missing)])
+
+def _top_performer_description(tienda_id, experimento, region, tipo_tienda,
+                               usuarios, conversiones, revenue, conversion_rate) -> str:
+    """Descripción de una fila de get_top_performers (campos en el orden de TOP_PERFORMER_COLUMNS)"""
+    return f"Tienda {tienda_id} en {region} ({tipo_tienda}) - {experimento}: {conversion_rate:.2f}% conversión, ${revenue:.2f} revenue"
+
+def _top_performer_descriptions(frame: pd.DataFrame) -> List[str]:
+    """Versión vectorizada de _top_performer_description: concatenación columna a columna"""
+    conversion_rate = np.char.mod('%.2f', frame['conversion_rate'].to_numpy())
+    revenue = np.char.mod('%.2f', frame['revenue'].to_numpy())
+    descriptions = (
+        "Tienda " + frame['tienda_id'].astype(str) + " en " + frame['region'].astype(str)
+        + " (" + frame['tipo_tienda'].astype(str) + ") - " + frame['experimento'].astype(str)
+        + ": " + conversion_rate.astype(object) + "% conversión, $" + revenue.astype(object) + " revenue"
+    )
+    return descriptions.tolist()
+
+@dataclass(slots=True)
+class SearchResult:
+    """Resultado de una búsqueda en Superlinked (con slots: sin __dict__ por instancia)"""
+    score: float
+    experimento: str
+    tienda_id: str
+    
+    @property
+    def data(self) -> Dict:
+        """Datos de la tienda; el resultado sólo trae experimento y tienda_id"""
+        return {'experimento': self.experimento, 'tienda_id': self.tienda_id, **UNAVAILABLE_RESULT_DATA}
+    
+    @property
+    def description(self) -> str:
+        return f"Resultado del experimento {self.experimento} en tienda {self.tienda_id}"
+    
+    def to_dict(self) -> Dict:
+        """Forma de diccionario (score, data, description) para serializar el resultado"""
+        return {'score': self.score, 'data': self.data, 'description': self.description}
+
+class TopPerformers:
+    """Top/bottom de tiendas por métrica directamente sobre el DataFrame del procesador
+    
+    No necesita índice ni modelo de embeddings: sirve las consultas de ranking sin esperar a Superlinked.
+    """
+    
+    def __init__(self, data_processor=None):
+        # Procesador con el DataFrame ya cargado (compartido con el chatbot); sin él se crea uno la primera vez
+        self._data_processor = data_processor
+        # (métrica, descendente) -> posiciones ordenadas; válidas mientras el DataFrame no cambie.
+        # Se guarda el propio DataFrame (un id() podría reutilizarse tras liberarlo) y un lock,
+        # porque get_top_performers se ejecuta en hilos (asyncio.to_thread)
+        self._ranked_positions = {}
+        self._ranked_data = None
+        self._ranking_lock = threading.Lock()
+    
+    @property
+    def data_processor(self):
+        """Procesador de datos usado por get_top_performers (se carga una sola vez)"""
+        if self._data_processor is None:
+            self._data_processor = ABTestingDataProcessor()
+        return self._data_processor
+    
+    def _ranking(self, data: pd.DataFrame, metric: str, descending: bool) -> np.ndarray:
+        """Orden de las filas por `metric`, calculado una vez por métrica y sentido"""
+        with self._ranking_lock:
+            if data is not self._ranked_data:
+                self._ranked_positions = {}
+                self._ranked_data = data
+            key = (metric, descending)
+            if key not in self._ranked_positions:
+                self._ranked_positions[key] = _ranked_positions(data[metric].to_numpy(), descending)
+            return self._ranked_positions[key]
+    
+    def get_top_performers(self, metric: str = 'conversion_rate', 
+                          order: str = 'desc', limit: int = 5,
+                          filters: Optional[Dict] = None) -> List[Dict]:
+        """Obtiene las tiendas con mejor/peor performance en una métrica específica"""
+        
+        # Usar directamente los datos del data processor para evitar problemas con Superlinked.
+        # No se copian: sólo se materializan las filas del top-K
+        data = self.data_processor.data
+        
+        # Aplicar filtros si se proporcionan: una única máscara fusionada, sin un frame intermedio por filtro
+        mask = np.ones(len(data), dtype=bool)
+        if filters:
+            for field_name, value in filters.items():
+                if field_name in data.columns:
+                    mask &= _column_equals(data[field_name], value)
+        
+        # Ordenar por la métrica especificada
+        reverse_order = (order.lower() == 'desc')
+        
+        try:
+            # Orden precalculado por métrica: el top-K son las primeras `limit` filas que pasan los filtros
+            ranking = self._ranking(data, metric, reverse_order)
+            # Las métricas se convierten en bloque: al iterar ya salen como int/float de Python
+            top_data = data.iloc[ranking[mask[ranking]][:max(limit, 0)]].astype(TOP_PERFORMER_METRIC_DTYPES)
+            
+            # Convertir a formato de resultados (tuplas planas: sin una Series por fila como iterrows)
+            rows = list(top_data[list(TOP_PERFORMER_COLUMNS)].itertuples(index=False, name=None))
+            if len(rows) >= VECTORIZED_MIN_ROWS:
+                descriptions = _top_performer_descriptions(top_data)
+            else:
+                descriptions = [_top_performer_description(*row) for row in rows]
+            
+            return [
+                {
+                    'tienda_id': tienda_id,
+                    'experimento': experimento,
+                    'region': region,
+                    'tipo_tienda': tipo_tienda,
+                    'usuarios': usuarios,
+                    'conversiones': conversiones,
+                    'revenue': revenue,
+                    'conversion_rate': conversion_rate,
+                    'description': description
+                }
+                for (tienda_id, experimento, region, tipo_tienda,
+                     usuarios, conversiones, revenue, conversion_rate), description in zip(rows, descriptions)
+            ]
+            
+        except Exception as e:
+            print(f"Error en get_top_performers: {e}")
+            return []
 
 class ABTestingQueryEngine:
     """Motor de consultas para AB Testing usando Superlinked"""
     
-    def __init__(self, index, schema, spaces, app):
+    def __init__(self, index, schema, spaces, app, data_processor=None, top_performers=None):
         self.index = index
         self.schema = schema
         self.spaces = spaces
         self.app = app
+        # Rankings por métrica sobre el DataFrame (no usan el índice); el chatbot puede compartir los suyos
+        self.top_performers = top_performers or TopPerformers(data_processor)
+    
+    @cached_property
+    def _schema_fields(self) -> Dict[str, Any]:
+        """Nombre -> campo del schema filtrable, resuelto una vez en vez de hasattr/getattr por filtro"""
+        return {
+            field_name: getattr(self.schema, field_name)
+            for field_name in SCHEMA_FIELDS if hasattr(self.schema, field_name)
+        }
+    
+    @property
+    def data_processor(self):
+        """Procesador de datos usado por get_top_performers (se carga una sola vez)"""
+        return self.top_performers.data_processor
     
     def semantic_search(self, 
                        query_text: str, 
                        filters: Optional[Dict] = None,
-                       limit: int = None) -> List[Dict]:
+                       limit: int = None) -> List[SearchResult]:
         """Búsqueda semántica con filtros opcionales"""
         
+        # Ejecutar query
+        results = self.app.query(self._semantic_query(query_text, filters, limit))
+        
+        return self._format_results(results)
+    
+    async def asemantic_search(self,
+                               query_text: str,
+                               filters: Optional[Dict] = None,
+                               limit: int = None) -> List[SearchResult]:
+        """Versión async de semantic_search: el embedding y la búsqueda se ejecutan en un hilo
+        
+        Permite solapar la búsqueda con otras tareas del event loop (análisis, otras búsquedas).
+        """
+        results = await asyncio.to_thread(self.app.query, self._semantic_query(query_text, filters, limit))
+        return self._format_results(results)
+    
+    def _semantic_query(self, query_text: str, filters: Optional[Dict], limit: Optional[int]):
+        """Construye la query de búsqueda semántica por descripción"""
         limit = limit or settings.default_limit
         
         # Crear query base
@@ -32,12 +341,9 @@ class ABTestingQueryEngine:
             weight=settings.description_space_weight
         )
         
-        # Ejecutar query
-        results = self.app.query(weighted_query.limit(limit))
-        
-        return self._format_results(results)
+        return weighted_query.limit(limit)
     
-    def filter_search(self, **filters) -> List[Dict]:
+    def filter_search(self, **filters) -> List[SearchResult]:
         """Búsqueda por filtros específicos"""
         
         query = Query(self.index)
@@ -50,50 +356,7 @@ class ABTestingQueryEngine:
                           order: str = 'desc', limit: int = 5,
                           filters: Optional[Dict] = None) -> List[Dict]:
         """Obtiene las tiendas con mejor/peor performance en una métrica específica"""
-        
-        # Usar directamente el data processor para evitar problemas con Superlinked
-        from data_processing import ABTestingDataProcessor
-        
-        # Acceder a los datos directamente desde el data processor
-        # Esto es una referencia temporal - necesitamos acceso al data processor
-        # Por ahora, crear una instancia nueva
-        data_processor = ABTestingDataProcessor()
-        data = data_processor.data.copy()
-        
-        # Aplicar filtros si se proporcionan
-        if filters:
-            for field_name, value in filters.items():
-                if field_name in data.columns:
-                    data = data[data[field_name] == value]
-        
-        # Ordenar por la métrica especificada
-        reverse_order = (order.lower() == 'desc')
-        
-        try:
-            # Ordenar datos
-            sorted_data = data.sort_values(by=metric, ascending=not reverse_order)
-            
-            # Convertir a formato de resultados
-            results = []
-            for _, row in sorted_data.head(limit).iterrows():
-                result = {
-                    'tienda_id': row['tienda_id'],
-                    'experimento': row['experimento'],
-                    'region': row['region'],
-                    'tipo_tienda': row['tipo_tienda'],
-                    'usuarios': int(row['usuarios']),
-                    'conversiones': int(row['conversiones']),
-                    'revenue': float(row['revenue']),
-                    'conversion_rate': float(row['conversion_rate']),
-                    'description': f"Tienda {row['tienda_id']} en {row['region']} ({row['tipo_tienda']}) - {row['experimento']}: {row['conversion_rate']:.2f}% conversión, ${row['revenue']:.2f} revenue"
-                }
-                results.append(result)
-            
-            return results
-            
-        except Exception as e:
-            print(f"Error en get_top_performers: {e}")
-            return []
+        return self.top_performers.get_top_performers(metric, order, limit, filters)
     
     def weighted_search(self,
                        query_text: str,
@@ -103,111 +366,52 @@ class ABTestingQueryEngine:
                        revenue_weight: float = None,
                        conversion_rate_weight: float = None,
                        filters: Optional[Dict] = None,
-                       limit: int = None) -> List[Dict]:
-        """Búsqueda con pesos personalizados para diferentes espacios"""
-        
-        limit = limit or settings.default_limit
-        
-        # Usar pesos de configuración como default
-        weights = {
-            'experimento': experimento_weight or settings.experimento_space_weight,
-            'region': region_weight or settings.region_space_weight,
-            'tipo_tienda': tipo_tienda_weight or settings.tipo_tienda_space_weight,
-            'revenue': revenue_weight or settings.revenue_space_weight,
-            'conversion_rate': conversion_rate_weight or settings.conversion_rate_space_weight,
-        }
+                       limit: int = None) -> List[SearchResult]:
+        """Búsqueda con pesos personalizados para diferentes espacios
         
-        # Crear query con pesos
-        query = Query(self.index)
-        
-        # Aplicar filtros
-        if filters:
-            query = self._apply_filters(query, filters)
-        
-        # Búsqueda semántica con pesos
-        weighted_query = query.find(self.schema).similar(
-            self.spaces['description'], query_text,
-            weight=settings.description_space_weight
-        )
-        
-        results = self.app.query(weighted_query.limit(limit))
-        return self._format_results(results)
+        La consulta sólo aporta texto al espacio de descripción: los espacios categóricos y numéricos
+        quedan vacíos en el vector de consulta, así que sus pesos no alteran el ranking y la búsqueda
+        es la misma que semantic_search. Los parámetros de peso están obsoletos: se aceptan por
+        compatibilidad y pasarlos emite un DeprecationWarning.
+        """
+        weights = (experimento_weight, region_weight, tipo_tienda_weight,
+                   revenue_weight, conversion_rate_weight)
+        if any(weight is not None for weight in weights):
+            warnings.warn(
+                "weighted_search ignora los pesos por espacio (la consulta solo usa el espacio de "
+                "descripción); usa semantic_search",
+                DeprecationWarning,
+                stacklevel=2
+            )
+        return self.semantic_search(query_text, filters=filters, limit=limit)
     
     def _apply_filters(self, query, filters: Dict):
         """Aplica filtros al query"""
         
+        schema_fields = self._schema_fields
         for field_name, value in filters.items():
-            if hasattr(self.schema, field_name):
-                field = getattr(self.schema, field_name)
+            field = schema_fields.get(field_name)
+            if field is not None:
                 # Usar where() en lugar de filter() para Superlinked
                 query = query.where(field == value)
         
         return query
     
-    def _format_results(self, results) -> List[Dict]:
+    def _format_results(self, results) -> List[SearchResult]:
         """Formatea los resultados del query"""
         
-        formatted_results = []
-        
-        # Basado en el debug, results es un QueryResult que se itera como tuplas
-        # La primera tupla es ('entries', [ResultEntry, ...])
-        for key, value in results:
-            if key == 'entries':
-                for entry in value:
-                    # entry es ResultEntry con id, fields, metadata
-                    # Extraer datos del id que tiene formato: experimento_tienda_idx
-                    id_parts = entry.id.split('_')
-                    if len(id_parts) >= 3:
-                        experimento = id_parts[0]
-                        # El tienda_id parece estar en el formato T_experimento_numero
-                        tienda_id = '_'.join(id_parts[1:3]) if len(id_parts) > 3 else id_parts[1]
-                    else:
-                        experimento = 'Unknown'
-                        tienda_id = 'Unknown'
-                    
-                    formatted_result = {
-                        'score': entry.metadata.score,
-                        'data': {
-                            'experimento': experimento,
-                            'tienda_id': tienda_id,
-                            'region': 'Unknown',  # No disponible en el resultado
-                            'tipo_tienda': 'Unknown',  # No disponible en el resultado
-                            'usuarios': 0,  # No disponible en el resultado
-                            'conversiones': 0,  # No disponible en el resultado  
-                            'revenue': 0.0,  # No disponible en el resultado
-                            'conversion_rate': 0.0  # No disponible en el resultado
-                        },
-                        'description': f"Resultado del experimento {experimento} en tienda {tienda_id}"
-                    }
-                    formatted_results.append(formatted_result)
-                break  # Solo procesar entries
-        
-        return formatted_results
+        # results es un QueryResult; sus entradas están en results.entries
+        entries = results.entries
+        if len(entries) >= VECTORIZED_MIN_ROWS:
+            parsed = zip(*_parse_result_ids([entry.id for entry in entries]))
+        else:
+            parsed = map(_parse_result_id, (entry.id for entry in entries))
+        
+        return [
+            SearchResult(entry.metadata.score, experimento, tienda_id)
+            for entry, (experimento, tienda_id) in zip(entries, parsed)
+        ]
     
     def extract_filters_from_query(self, query: str) -> Dict:
         """Extrae filtros potenciales de la consulta del usuario"""
-        filters = {}
-        query_lower = query.lower()
-        
-        # Detectar experimento
-        if 'control' in query_lower:
-            filters['experimento'] = 'Control'
-        elif 'experimento' in query_lower or 'variante' in query_lower:
-            filters['experimento'] = 'Experimento_A'
-        
-        # Detectar región
-        regions = ['este', 'norte', 'sur', 'oeste']
-        for region in regions:
-            if region in query_lower:
-                filters['region'] = region.capitalize()
-                break
-        
-        # Detectar tipo de tienda
-        if 'mall' in query_lower:
-            filters['tipo_tienda'] = 'Mall'
-        elif 'street' in query_lower or 'calle' in query_lower:
-            filters['tipo_tienda'] = 'Street'
-        elif 'outlet' in query_lower:
-            filters['tipo_tienda'] = 'Outlet'
-        
-        return filters
\ No newline at end of file
+        return extract_filters_from_query(query)
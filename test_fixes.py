@@ -4,8 +4,14 @@ Script de prueba para verificar los fixes del chatbot
 """
 
 import os
+import re
 import sys
 
+# Saludos y palabras de conteo: se comparan por palabra completa contra la consulta tokenizada
+GREETINGS = frozenset({"hola", "hello", "hi"})
+COUNT_WORDS = frozenset({"cuántos", "cuántas", "total"})
+WORD_PATTERN = re.compile(r"\w+")
+
 # Configurar variables de entorno básicas para la prueba
 os.environ['OPENAI_API_KEY'] = 'test-key-for-local-testing'
 
@@ -45,8 +51,6 @@ try:
     print("\n🧪 Probando consultas simples específicas...")
     
     # Simular chatbot sin OpenAI
-    from chatbot_v2 import ABTestingChatbotV2
-    
     # Mock para evitar llamada a OpenAI
     class MockChatbot:
         def __init__(self):
@@ -55,14 +59,15 @@ try:
         def _handle_simple_queries(self, query):
             # Copiar el método del chatbot real
             query_lower = query.lower()
+            tokens = set(WORD_PATTERN.findall(query_lower))
             
             # Saludos simples
-            if any(greeting in query_lower for greeting in ["hola", "hello", "hi"]):
+            if not GREETINGS.isdisjoint(tokens):
                 if len(query_lower.strip()) <= 10:
                     return "¡Hola! Estoy aquí para ayudarte con el análisis de AB Testing."
             
             # Preguntas sobre usuarios
-            if any(phrase in query_lower for phrase in ["cuántos", "cuántas", "total"]):
+            if not COUNT_WORDS.isdisjoint(tokens):
                 if "usuario" in query_lower:
                     if "control" in query_lower:
                         control_data = self.data_processor.data[self.data_processor.data['experimento'] == 'Control']
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los cambios de comportamiento introducidos al optimizar el chatbot
+Se ejecutan con `python test_regressions.py` (o con pytest si está instalado)
+"""
+
+import os
+import sys
+import traceback
+
+import pandas as pd
+
+# Configurar variables de entorno básicas para la prueba
+os.environ.setdefault('OPENAI_API_KEY', 'test-key-for-local-testing')
+
+from analytics import ABTestingAnalytics
+from intent_router import IntentRouter, IntentType
+
+# Dataset mínimo: dos tiendas por experimento con métricas fáciles de sumar
+SAMPLE_DATA = pd.DataFrame({
+    'experimento': ['Control', 'Control', 'Experimento_A', 'Experimento_A',
+                    'Experimento_B', 'Experimento_B', 'Experimento_C', 'Experimento_C'],
+    'tienda_id': ['T_Control_001', 'T_Control_002', 'T_Experimento_A_001', 'T_Experimento_A_002',
+                  'T_Experimento_B_001', 'T_Experimento_B_002', 'T_Experimento_C_001', 'T_Experimento_C_002'],
+    'region': ['Norte', 'Sur', 'Este', 'Oeste', 'Norte', 'Sur', 'Este', 'Oeste'],
+    'tipo_tienda': ['Mall', 'Street', 'Outlet', 'Mall', 'Street', 'Outlet', 'Mall', 'Street'],
+    'usuarios': [100, 200, 110, 210, 120, 220, 130, 230],
+    'conversiones': [10, 20, 11, 21, 12, 22, 13, 23],
+    'revenue': [50.0, 100.0, 55.0, 105.0, 60.0, 110.0, 65.0, 115.0],
+    'conversion_rate': [10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0, 10.0],
+})
+
+class SampleDataProcessor:
+    """Procesador con la misma interfaz que usa IntentRouter (data + get_data_summary)"""
+
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+
+    def get_data_summary(self):
+        return {
+            'total_records': len(self.data),
+            'experiments': sorted(self.data['experimento'].unique()),
+            'regions': sorted(self.data['region'].unique()),
+            'store_types': sorted(self.data['tipo_tienda'].unique()),
+            'total_users': int(self.data['usuarios'].sum()),
+            'total_conversions': int(self.data['conversiones'].sum()),
+            'total_revenue': float(self.data['revenue'].sum()),
+        }
+
+def _router() -> IntentRouter:
+    return IntentRouter(SampleDataProcessor(SAMPLE_DATA), settings=None)
+
+# --- Router de intents: Experimento B/C con respuesta propia (chunk2-9) ---
+
+def test_counts_answer_for_experiments_b_and_c():
+    router = _router()
+    assert router.route_query("¿Cuántas conversiones tiene el experimento b?") == \
+        "El Experimento B tiene un total de 34 conversiones."
+    assert router.route_query("¿Cuántas tiendas tiene el experimento c?") == \
+        "El Experimento C tiene 2 tiendas."
+    assert router.route_query("¿Cuántos usuarios tiene el experimento_c?") == \
+        "El Experimento C tiene 2 tiendas con un total de 360 usuarios."
+
+def test_control_takes_precedence_over_variants():
+    router = _router()
+    assert router.route_query("¿Cuántas conversiones tiene control frente al experimento b?") == \
+        "El grupo Control tiene un total de 30 conversiones."
+
+def test_unnamed_experiment_still_lists_all_variants():
+    router = _router()
+    response = router.route_query("¿Cuántos usuarios por experimento?")
+    assert response.startswith("Total de usuarios por experimento:")
+    assert "• Experimento_B: 340 usuarios" in response
+    assert "• Experimento_C: 360 usuarios" in response
+
+def test_combined_pattern_matches_across_lines():
+    router = _router()
+    assert router.classify_intent("consulta\n¿cuántas tiendas hay?").type is IntentType.COUNT_QUERY
+    assert router.classify_intent("datos de la tienda\nT_Control_001").type is IntentType.STORE_ID_QUERY
+
+# --- Filtros de la consulta: palabras completas (chunk0-7) ---
+
+def _extract_filters(query: str):
+    # query.py importa el procesador de datos (y Superlinked): solo se carga al usar los filtros
+    from query import extract_filters_from_query
+    return extract_filters_from_query(query)
+
+def test_filters_match_whole_words():
+    assert _extract_filters("tiendas del oeste") == {'region': 'Oeste'}
+    assert _extract_filters("sureste mall") == {'tipo_tienda': 'Mall'}
+    assert _extract_filters("noreste") == {}
+
+def test_filters_accept_plurals_and_combinations():
+    assert _extract_filters("experimentos en outlets") == \
+        {'experimento': 'Experimento_A', 'tipo_tienda': 'Outlet'}
+    assert _extract_filters("Control en el Sur") == {'experimento': 'Control', 'region': 'Sur'}
+
+# --- Análisis por segmentos: valores ausentes y grupo Control vacío (chunk0-8) ---
+
+def test_segments_skip_missing_values_but_keep_rows_in_other_view():
+    data = pd.DataFrame({
+        'experimento': ['Control'] * 3 + ['Experimento_A'] * 3,
+        'tienda_id': [f'T_{i:03d}' for i in range(6)],
+        'region': [None, 'Norte', 'Sur', 'Norte', 'Sur', 'Sur'],
+        'tipo_tienda': ['Mall', 'Street', 'Mall', 'Mall', 'Street', None],
+        'usuarios': [100] * 6,
+        'conversiones': [10] * 6,
+        'revenue': [50.0] * 6,
+        'conversion_rate': [10.0] * 6,
+    })
+    results = ABTestingAnalytics(data).analyze_ab_test_results()
+
+    # Las filas con NaN no forman segmento propio...
+    assert set(results['regional_analysis']) == {'Norte', 'Sur'}
+    assert set(results['store_type_analysis']) == {'Mall', 'Street'}
+    # ...pero siguen contando en la vista de la otra dimensión
+    assert results['store_type_analysis']['Mall']['sample_size_control'] == 2
+    assert results['regional_analysis']['Sur']['sample_size_experiment'] == 2
+
+def test_segments_without_control_group():
+    data = SAMPLE_DATA[SAMPLE_DATA['experimento'] != 'Control'].reset_index(drop=True)
+    results = ABTestingAnalytics(data).analyze_ab_test_results()
+    assert results['regional_analysis'] == {}
+    assert results['store_type_analysis'] == {}
+    assert 'Experimento_A' in results
+
+def run_all_tests() -> int:
+    """Ejecuta todas las funciones test_* del módulo; devuelve el número de fallos"""
+    tests = [(name, test) for name, test in globals().items() if name.startswith('test_') and callable(test)]
+    failures = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except Exception:
+            failures += 1
+            print(f"❌ {name}")
+            traceback.print_exc()
+    print(f"\n{len(tests) - failures}/{len(tests)} pruebas correctas")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if run_all_tests() else 0)
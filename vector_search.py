@@ -0,0 +1,224 @@
+"""
+Búsqueda vectorial en memoria con similitudes calculadas por lotes
+Reemplaza el cálculo vector a vector de Superlinked por un único matmul numpy
+e incluye la persistencia en disco del VDB en memoria entre ejecuciones
+"""
+
+import numpy as np
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from superlinked.framework.common.calculation.distance_metric import DistanceMetric
+    from superlinked.framework.storage.in_memory import in_memory_vdb
+    from superlinked.framework.storage.in_memory.in_memory_search import InMemorySearch
+    from superlinked.framework.storage.in_memory.object_serializer import ObjectSerializer
+except ImportError:  # Versiones de Superlinked con otra estructura interna
+    in_memory_vdb = None
+    InMemorySearch = object
+    ObjectSerializer = object
+
+class StackedVectors:
+    """Vectores de un campo del VDB apilados en una matriz float32 (N, D) + índice row_id -> fila
+    
+    Las filas se añaden al ver vectores nuevos y se reutilizan entre consultas. El VDB guarda
+    un objeto Vector nuevo en cada escritura, así que una fila se reescribe cuando su objeto cambia.
+    """
+
+    def __init__(self, store):
+        self.store = store  # almacén del VDB al que pertenecen las filas
+        self.rows: Dict[str, Tuple[Any, int]] = {}  # row_id -> (Vector, fila)
+        self.arrays: Optional[Tuple[np.ndarray, ...]] = None
+
+    def positions(self, filtered_vectors: Dict[str, Any]) -> np.ndarray:
+        """Filas de los vectores filtrados (en su orden), incorporando antes los nuevos o reescritos"""
+        rows = self.rows
+        stale = [
+            row_id for row_id, vector in filtered_vectors.items()
+            if (rows.get(row_id) or (None,))[0] is not vector
+        ]
+        if stale:
+            self._write(stale, filtered_vectors)
+        return np.fromiter(
+            (rows[row_id][1] for row_id in filtered_vectors), dtype=np.intp, count=len(filtered_vectors)
+        )
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Arrays almacenados para un bloque de vectores (primera dimensión = filas)"""
+        return (vectors.astype(np.float32, copy=False),)
+
+    def _write(self, row_ids, filtered_vectors: Dict[str, Any]) -> None:
+        encoded = self._encode(np.vstack([filtered_vectors[row_id].value for row_id in row_ids]))
+        if self.arrays is None:
+            self.arrays = tuple(np.empty((0,) + array.shape[1:], dtype=array.dtype) for array in encoded)
+
+        size = len(self.arrays[0])
+        targets = []
+        for row_id in row_ids:
+            entry = self.rows.get(row_id)
+            position = size + len(targets) if entry is None else entry[1]
+            targets.append(position)
+            self.rows[row_id] = (filtered_vectors[row_id], position)
+
+        grow = len(self.rows) - size
+        if grow:
+            self.arrays = tuple(
+                np.concatenate([array, np.empty((grow,) + array.shape[1:], dtype=array.dtype)])
+                for array in self.arrays
+            )
+        for array, values in zip(self.arrays, encoded):
+            array[targets] = values
+
+    def scores(self, query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Producto escalar de la consulta con las filas indicadas"""
+        (matrix,) = self.arrays
+        if 2 * len(positions) < len(matrix):
+            return matrix[positions] @ query
+        # Pocas filas descartadas: un solo matmul sobre la matriz completa y luego selección
+        return (matrix @ query)[positions]
+
+class BatchedInMemorySearch(InMemorySearch):
+    """InMemorySearch que mantiene apilados los vectores indexados y calcula todas las similitudes de una vez"""
+
+    # Almacenamiento de las matrices apiladas (las subclases pueden cambiar la codificación)
+    stack_class = StackedVectors
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stacks: Dict[str, StackedVectors] = {}  # campo vectorial -> matriz apilada
+        self._stacks_lock = threading.Lock()
+        # _calculate_similarities no recibe el campo: se anota por hilo para la consulta en curso
+        self._current = threading.local()
+
+    def _filter_indexed_vectors(self, vdb, vector_field, filters):
+        self._current.source = (vdb, vector_field.name)
+        return super()._filter_indexed_vectors(vdb, vector_field, filters)
+
+    def _calculate_similarities(self, distance_metric, vector, filtered_vectors) -> Dict[str, float]:
+        source = getattr(self._current, 'source', None)
+        if not filtered_vectors or source is None or distance_metric is not DistanceMetric.INNER_PRODUCT:
+            return super()._calculate_similarities(distance_metric, vector, filtered_vectors)
+
+        store, field_name = source
+        with self._stacks_lock:
+            stack = self._stacks.get(field_name)
+            # close_connection sustituye el almacén del VDB: las filas apiladas dejan de existir
+            if stack is None or stack.store is not store:
+                stack = self._stacks[field_name] = self.stack_class(store)
+            positions = stack.positions(filtered_vectors)
+            scores = stack.scores(np.asarray(vector.value, dtype=np.float32), positions)
+
+        return dict(zip(filtered_vectors.keys(), scores.tolist()))
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cuantización simétrica int8 por fila: vectors ≈ q * scale"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scale = np.max(np.abs(vectors), axis=1, keepdims=True) / 127
+    scale[scale == 0] = 1  # vectores nulos: cualquier escala reproduce el cero
+    quantized = np.round(vectors / scale).astype(np.int8)
+    return quantized, scale.ravel()
+
+class QuantizedStackedVectors(StackedVectors):
+    """Variante int8 de StackedVectors: matriz int8 (N, D) contigua + vector de escalas por fila
+    
+    La matriz apilada ocupa 4x menos que la float32 (los vectores originales siguen en el VDB).
+    """
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, ...]:
+        return quantize_int8(vectors)
+
+    def scores(self, query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        quantized, scales = self.arrays
+        selected = 2 * len(positions) < len(quantized)
+        if selected:
+            quantized, scales = quantized[positions], scales[positions]
+
+        # Se descuantiza por bloques para que el producto use BLAS float32 sin materializar
+        # la matriz completa en float32
+        dots = np.empty(len(quantized), dtype=np.float32)
+        for start in range(0, len(quantized), DEQUANTIZE_BLOCK_ROWS):
+            block = quantized[start:start + DEQUANTIZE_BLOCK_ROWS]
+            dots[start:start + len(block)] = block.astype(np.float32) @ query
+        dots *= scales
+        return dots if selected else dots[positions]
+
+# Filas descuantizadas a la vez al puntuar (bloque de ~DEQUANTIZE_BLOCK_ROWS * D * 4 bytes)
+DEQUANTIZE_BLOCK_ROWS = 1024
+
+class QuantizedInMemorySearch(BatchedInMemorySearch):
+    """Variante int8 de BatchedInMemorySearch: menos memoria para la matriz apilada a cambio de
+    algo de precisión y de tiempo de descuantización en cada consulta"""
+
+    stack_class = QuantizedStackedVectors
+
+# Clase de búsqueda instalada en in_memory_vdb (None mientras no se haya llamado a install_batched_search)
+_INSTALLED_SEARCH = None
+
+def install_batched_search(quantize: bool = False) -> bool:
+    """Hace que los InMemoryVDB creados a partir de ahora usen BatchedInMemorySearch
+    
+    Con `quantize=True` se usa QuantizedInMemorySearch (matriz apilada en int8, 4x menor que la
+    float32 de BatchedInMemorySearch, algo más lenta por la descuantización).
+    El parche es global al proceso: la primera llamada fija el modo y las siguientes son
+    idempotentes; si piden otro modo no lo cambian y devuelven False.
+    """
+    global _INSTALLED_SEARCH
+    if in_memory_vdb is None or not hasattr(in_memory_vdb, 'InMemorySearch'):
+        return False
+    search_class = QuantizedInMemorySearch if quantize else BatchedInMemorySearch
+    if _INSTALLED_SEARCH is None:
+        in_memory_vdb.InMemorySearch = search_class
+        _INSTALLED_SEARCH = search_class
+    return _INSTALLED_SEARCH is search_class
+
+class FileObjectSerializer(ObjectSerializer):
+    """Serializer de Superlinked que guarda cada objeto como un fichero de texto en un directorio"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def read(self, key: str) -> str:
+        return (self.directory / f"{key}.json").read_text(encoding="utf-8")
+
+    def write(self, serialized_object: str, key: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{key}.json").write_text(serialized_object, encoding="utf-8")
+
+def _vdb_connector(app):
+    """Conector del VDB en memoria de una app (None si esta versión de Superlinked no lo expone)"""
+    # El conector vivo es el del storage manager (VectorDatabase crea uno nuevo en cada acceso)
+    storage_manager = getattr(app, 'storage_manager', None)
+    connector = getattr(storage_manager, '_vdb_connector', None)
+    if connector is None or not hasattr(connector, 'persist') or not hasattr(connector, 'restore'):
+        return None
+    return connector
+
+def persist_index(app, directory: Path) -> bool:
+    """Guarda en disco los vectores indexados por la app en memoria; False si no es posible"""
+    connector = _vdb_connector(app)
+    if connector is None or ObjectSerializer is object:
+        return False
+    connector.persist(FileObjectSerializer(directory))
+    return True
+
+def restore_index(app, directory: Path) -> bool:
+    """Carga en la app en memoria vectores persistidos; False si no existen o no es posible"""
+    connector = _vdb_connector(app)
+    if connector is None or ObjectSerializer is object or not Path(directory).is_dir():
+        return False
+    try:
+        connector.restore(FileObjectSerializer(directory))
+    except (OSError, ValueError):
+        return False
+    return True
+
+def evict_stale_caches(cache_dir: Path, pattern: str, keep: int) -> None:
+    """Elimina las entradas de cache más antiguas (por mtime) que cumplen `pattern`"""
+    entries = sorted(Path(cache_dir).glob(pattern), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in entries[keep:]:
+        if stale.is_dir():
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            stale.unlink(missing_ok=True)